@@ -0,0 +1,142 @@
+import difflib
+import math
+import re
+from collections import defaultdict
+
+from vtt import format_timestamp
+
+# cues per matching window; a heading is usually introduced over a few sentences
+WINDOW_CUES = 8
+# matches earlier than the previous item are allowed, but only when clearly better
+BACKTRACK_PENALTY = 0.8
+# item terms never spoken verbatim (acronyms, transcription slips like "elbow" for ELBO)
+# fall back to the closest transcript term at least this similar
+FUZZY_CUTOFF = 0.75
+
+ITEM_RE = re.compile(r"(<(h1|h2|h3|li)\b[^>]*>)(\s*)([^<]*)", re.IGNORECASE)
+STAMP_RE = re.compile(r"^\[\d{1,2}:\d{2}:\d{2}\]")
+NUMBERING_RE = re.compile(r"^\s*\d+(\.\d+)*\.?\s*")
+WORD_RE = re.compile(r"[a-z0-9]+")
+SUFFIXES = ("ations", "ation", "ings", "ing", "ies", "ied", "es", "ed", "ly", "s")
+STOPWORDS = frozenset("""
+a an the and or but if of to in on at by for with from as is are was were be been being this that these
+those it its into about over under than then so such not no do does did can could will would should may
+might must we you they he she i our your their his her what which who how why when where all any some
+more most other also just like very um uh okay gonna going get got let lets one two use using used
+""".split())
+
+
+def stem(word):
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            break
+    return word[:7]
+
+
+def terms(text):
+    return [stem(word) for word in WORD_RE.findall(text.lower()) if word not in STOPWORDS and len(word) > 1]
+
+
+class Aligner:
+    """
+    Finds where outline items are discussed in a transcript. Each cue's terms
+    go into an inverted index; an item is scored against every window of
+    WINDOW_CUES consecutive cues by the idf weight of the item terms the window
+    contains, and stamped with the first matching cue of the best window.
+    """
+
+    def __init__(self, index, window=WINDOW_CUES):
+        self.index = index
+        self.window = window
+        self.postings = defaultdict(list)
+        for i in range(len(index)):
+            text = index.text[index.text_offsets[i]:index.text_offsets[i + 1]]
+            for term in set(terms(text)):
+                self.postings[term].append(i)
+        # rarer terms say more about where a topic is discussed
+        self.idf = {term: math.log(1 + len(index) / len(cues)) for term, cues in self.postings.items()}
+        self.vocabulary = list(self.postings)
+        self._fuzzy = {}
+
+    def resolve(self, term):
+        """The transcript term an item term stands for, or None."""
+        if term in self.postings:
+            return term
+        if term not in self._fuzzy:
+            close = difflib.get_close_matches(term, self.vocabulary, n=1, cutoff=FUZZY_CUTOFF)
+            self._fuzzy[term] = close[0] if close else None
+        return self._fuzzy[term]
+
+    def scores(self, item_terms):
+        """Score per window start, counting each term once per window. Terms must be in the transcript."""
+        n = len(self.index)
+        delta = [0.0] * (n + 1)
+        for term in set(item_terms):
+            cues = self.postings[term]
+            weight = self.idf[term]
+            # merge the window ranges [cue - window + 1, cue] covered by this term
+            range_start = range_end = None
+            for cue in cues:
+                start = max(0, cue - self.window + 1)
+                if range_end is not None and start <= range_end + 1:
+                    range_end = cue
+                    continue
+                if range_end is not None:
+                    delta[range_start] += weight
+                    delta[range_end + 1] -= weight
+                range_start, range_end = start, cue
+            delta[range_start] += weight
+            delta[range_end + 1] -= weight
+
+        scores = []
+        total = 0.0
+        for i in range(n):
+            total += delta[i]
+            scores.append(total)
+        return scores
+
+    def locate(self, text, after=0):
+        """
+        Cue index where text is best matched, or None without any match.
+        Windows starting before after are penalised so items stay in lecture order.
+        """
+        item_terms = [term for term in map(self.resolve, terms(NUMBERING_RE.sub("", text))) if term]
+        if not item_terms or not len(self.index):
+            return None
+        scores = self.scores(item_terms)
+        best = max(range(len(scores)), key=lambda i: scores[i] * (BACKTRACK_PENALTY if i < after else 1))
+        if scores[best] <= 0:
+            return None
+
+        wanted = set(item_terms)
+        for cue in range(best, min(best + self.window, len(self.index))):
+            text = self.index.text[self.index.text_offsets[cue]:self.index.text_offsets[cue + 1]]
+            if wanted.intersection(terms(text)):
+                return cue
+        return best
+
+    def align(self, html):
+        """
+        Prefix every <h1>, <h2>, <h3> and <li> in html with the [hh:mm:ss] where it
+        is discussed. Items with no match reuse the previous stamp; items that
+        already carry a stamp are left alone.
+        """
+        position = 0
+
+        def stamp(match):
+            nonlocal position
+            opening, _, space, text = match.groups()
+            if not text.strip() or STAMP_RE.match(text.strip()):
+                return match.group(0)
+            cue = self.locate(text, after=position)
+            if cue is not None:
+                position = cue
+            seconds = self.index.starts[position] if len(self.index) else 0
+            return f"{opening}{space}{format_timestamp(seconds)} {text.lstrip()}"
+
+        return ITEM_RE.sub(stamp, html)
+
+
+def align_outline(html, index):
+    return Aligner(index).align(html)
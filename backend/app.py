@@ -1,18 +1,37 @@
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form, Request
+from fastapi.responses import StreamingResponse, Response
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel, EmailStr, Field
-from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from motor.motor_asyncio import AsyncIOMotorClient
 from bson import ObjectId
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
 from typing import List, Optional, Dict, Any
-import shutil
 import os
 import json
-from summarize_transcript import generate_notes
+import asyncio
+import gzip
+import hashlib
+import re
+import shutil
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from summarize_transcript import run_note_pipeline
+from jobs import JobManager
+from vtt import CueIndex, CueIndexCache, vtt_digest, format_timestamp
+from search import LECTURE_TEXT_INDEX, LECTURE_TEXT_WEIGHTS, SEARCH_FIELDS, index_terms, term_pattern, term_entries, lecture_hit
+from align import terms
+from blob_store import BlobStore, DEFAULT_BLOB_DIR, content_digest
+from slides import slide_pages, map_slides
+from user_cache import UserCache
+from passwords import PasswordPool
+from http_client import limiter_stats
 
 # Config
 SECRET_KEY = "your_secret_key"
@@ -45,9 +64,223 @@ db = client.user_db
 users_collection = db.users
 courses_collection = db.courses
 lectures_collection = db.lectures
+lecture_terms_collection = db.lecture_terms
+upload_sessions_collection = db.upload_sessions
+
+# Background note generation; a couple of workers is plenty since each run is mostly waiting on Gemini
+NOTE_JOB_WORKERS = int(os.environ.get("NOTE_JOB_WORKERS", "2"))
+job_manager = JobManager(max_workers=NOTE_JOB_WORKERS)
+
+# Lecture material fields the AI notes are generated from, mapped to the pipeline input each one feeds
+AI_NOTE_INPUTS = {
+    "userNotes": "user_notes_path",
+    "transcript": "text_file_path",
+    "transcriptvtt": "vtt_file_path",
+    "slides": "slides_path",
+}
+
+# Pipeline inputs of running note jobs, a directory per job; kept out of the served uploads
+NOTE_INPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "note_inputs")
+os.makedirs(NOTE_INPUT_DIR, exist_ok=True)
+
+# Large text materials live in the blob store; the lecture document keeps {"blob": digest, "size": chars}
+BLOB_FIELDS = ("transcript", "transcriptvtt", "userNotes", "ai_note")
+BLOB_MIN_BYTES = int(os.environ.get("BLOB_MIN_BYTES", "4096"))
+blob_store = BlobStore(os.environ.get("BLOB_DIR", DEFAULT_BLOB_DIR))
+# Blobs no lecture points at any more (superseded notes and stages) are deleted this often
+BLOB_GC_INTERVAL = int(os.environ.get("BLOB_GC_HOURS", "24")) * 3600
+
+# Users behind recent tokens, so authenticated requests skip the users lookup; 0 disables the cache
+USER_CACHE_TTL = int(os.environ.get("USER_CACHE_TTL", "60"))
+USER_CACHE_ENTRIES = int(os.environ.get("USER_CACHE_ENTRIES", "1024"))
+user_cache = UserCache(max_entries=USER_CACHE_ENTRIES, ttl=USER_CACHE_TTL)
+
+# Lecture material responses at least this large are gzipped for clients that accept it
+GZIP_MIN_BYTES = int(os.environ.get("GZIP_MIN_BYTES", "1024"))
+
+# Parsed transcripts for time-range lookups, most recently used first
+TRANSCRIPT_INDEX_ENTRIES = int(os.environ.get("TRANSCRIPT_INDEX_ENTRIES", "64"))
+transcript_indexes = CueIndexCache(max_entries=TRANSCRIPT_INDEX_ENTRIES)
+
+# Listing page sizes; clients pass next_cursor back to get the following page
+PAGE_SIZE_DEFAULT = int(os.environ.get("PAGE_SIZE_DEFAULT", "50"))
+PAGE_SIZE_MAX = int(os.environ.get("PAGE_SIZE_MAX", "200"))
+
+# Resumable uploads: how long an unfinished session is kept, and the chunk size clients are told to use
+UPLOAD_SESSION_TTL = int(os.environ.get("UPLOAD_SESSION_TTL", str(2 * 24 * 3600)))
+UPLOAD_SESSION_CHUNK_BYTES = int(os.environ.get("UPLOAD_SESSION_CHUNK_MB", "8")) * 1024 * 1024
+
+# Search results per request
+SEARCH_MAX_RESULTS = int(os.environ.get("SEARCH_MAX_RESULTS", "50"))
+
+@app.on_event("startup")
+async def ensure_indexes():
+    """Create the indexes the queries below rely on; existing ones are left alone."""
+    # login and every authenticated request look users up by email
+    try:
+        await users_collection.create_index([("email", ASCENDING)], unique=True, name="email_unique")
+    except OperationFailure as e:
+        # duplicate emails already stored; fall back to a plain index until they are cleaned up
+        print(f"Could not create unique email index: {e}")
+        await users_collection.create_index([("email", ASCENDING)], name="email")
+    # abandoned resumable uploads are forgotten after a couple of days
+    await upload_sessions_collection.create_index(
+        [("created_at", ASCENDING)], expireAfterSeconds=UPLOAD_SESSION_TTL, name="upload_session_expiry"
+    )
+    # lecture listings and lookups filter by course; _id keeps listings in index order
+    await lectures_collection.create_index([("course_id", ASCENDING), ("_id", ASCENDING)], name="course_lectures")
+    # search hits read their snippets from the matching terms of the top lectures
+    await lecture_terms_collection.create_index([("lecture_id", ASCENDING), ("stem", ASCENDING)], name="lecture_stems")
+    # MongoDB keeps the text index current on every insert and update
+    try:
+        await lectures_collection.create_index(
+            LECTURE_TEXT_INDEX, weights=LECTURE_TEXT_WEIGHTS, name="lecture_text", default_language="english"
+        )
+    except OperationFailure:
+        # a collection has one text index; replace one built over other fields, whatever it is called
+        indexes = await lectures_collection.index_information()
+        for name, index in indexes.items():
+            if any(kind == "text" for _, kind in index["key"]):
+                await lectures_collection.drop_index(name)
+        await lectures_collection.create_index(
+            LECTURE_TEXT_INDEX, weights=LECTURE_TEXT_WEIGHTS, name="lecture_text", default_language="english"
+        )
+
+@app.on_event("startup")
+async def clear_note_inputs():
+    """Jobs do not survive a restart, so any input directory left behind belongs to no job."""
+    for name in os.listdir(NOTE_INPUT_DIR):
+        shutil.rmtree(os.path.join(NOTE_INPUT_DIR, name), ignore_errors=True)
+
+# Blob-backed materials
+def is_blob_ref(value):
+    return isinstance(value, dict) and "blob" in value
+
+async def to_stored(value):
+    """What goes in the lecture document for a text value: a blob reference when large, else the text."""
+    if not isinstance(value, str) or len(value.encode("utf-8")) < BLOB_MIN_BYTES:
+        return value
+    digest = await asyncio.to_thread(blob_store.put, value)
+    return {"blob": digest, "size": len(value)}
+
+async def from_stored(value):
+    """The text for a stored value; older lectures hold their text inline."""
+    if is_blob_ref(value):
+        return await asyncio.to_thread(blob_store.get, value["blob"])
+    return value if value is not None else ""
+
+def stored_digest(value):
+    return value["blob"] if is_blob_ref(value) else content_digest(value)
+
+async def stored_materials(fields: dict):
+    """Set of "materials.*" and "search_text.*" updates for the given material values."""
+    update = {}
+    for field, value in fields.items():
+        update[f"materials.{field}"] = await to_stored(value) if field in BLOB_FIELDS else value
+        if field in SEARCH_FIELDS:
+            update[f"search_text.{field}"] = index_terms(value)
+    if "transcriptvtt" in fields:
+        update["materials.transcriptvtt_digest"] = vtt_digest(fields["transcriptvtt"])
+    return update
+
+async def index_lecture_terms(lecture_oid: ObjectId, fields: dict):
+    """
+    Replace the search term entries of the searchable fields among the given material values.
+    Transcript entries come from the VTT cues when it is given, so they carry the time they are spoken
+    """
+    if "transcriptvtt" in fields and "transcript" not in fields:
+        fields = {**fields, "transcript": ""}
+    rebuilt = [field for field in SEARCH_FIELDS if field in fields]
+    if not rebuilt:
+        return
+
+    def build():
+        cues = CueIndex.from_text(fields["transcriptvtt"]) if fields.get("transcriptvtt") else None
+        return [
+            {"lecture_id": lecture_oid, **entry}
+            for field in rebuilt
+            for entry in term_entries(field, fields[field] or "", cues)
+        ]
+
+    entries = await asyncio.to_thread(build)
+    await lecture_terms_collection.delete_many({"lecture_id": lecture_oid, "field": {"$in": rebuilt}})
+    if entries:
+        await lecture_terms_collection.insert_many(entries, ordered=False)
+
+# Lectures saved before blobs and search entries existed are brought up to date once, in the background
+BACKFILL_BATCH = 100
+
+async def backfill_lecture(lecture: dict):
+    materials = lecture.get("materials", {})
+    fields = [field for field in BLOB_FIELDS if field in materials]
+    texts = {field: await from_stored(materials[field]) for field in fields}
+    update = await stored_materials(texts)
+    for name, value in (lecture.get("ai_stages") or {}).items():
+        if isinstance(value, str):
+            update[f"ai_stages.{name}"] = await to_stored(value)
+    update["search_indexed"] = True
+    # only if the fields are still what was read; a write in the meantime brought its own
+    matched = {f"materials.{field}": materials[field] for field in fields}
+    result = await lectures_collection.update_one({"_id": lecture["_id"], **matched}, {"$set": update})
+    if result.matched_count:
+        await index_lecture_terms(lecture["_id"], texts)
+
+async def backfill_lectures():
+    done = 0
+    last_id = None
+    while True:
+        query = {"search_indexed": {"$exists": False}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await lectures_collection.find(query, {"materials": 1, "ai_stages": 1}).sort("_id", ASCENDING).limit(BACKFILL_BATCH).to_list(length=BACKFILL_BATCH)
+        if not batch:
+            break
+        for lecture in batch:
+            try:
+                await backfill_lecture(lecture)
+                done += 1
+            except Exception as e:
+                print(f"Could not backfill lecture {lecture['_id']}: {e}")
+        last_id = batch[-1]["_id"]
+    if done:
+        print(f"Backfilled blobs and search entries for {done} lectures")
+
+async def collect_blob_garbage():
+    """Delete blobs no lecture material or AI stage refers to."""
+    referenced = set()
+    async for lecture in lectures_collection.find({}, {"materials": 1, "ai_stages": 1}):
+        for value in [*lecture.get("materials", {}).values(), *(lecture.get("ai_stages") or {}).values()]:
+            if is_blob_ref(value):
+                referenced.add(value["blob"])
+    deleted = await asyncio.to_thread(blob_store.sweep, referenced)
+    if deleted:
+        print(f"Deleted {deleted} unreferenced blobs")
+
+async def maintain_lectures():
+    try:
+        await backfill_lectures()
+    except Exception as e:
+        print(f"Lecture backfill stopped: {e}")
+    while True:
+        try:
+            await collect_blob_garbage()
+        except Exception as e:
+            print(f"Blob sweep failed: {e}")
+        await asyncio.sleep(BLOB_GC_INTERVAL)
+
+maintenance_tasks = set()
+
+@app.on_event("startup")
+async def start_lecture_maintenance():
+    task = asyncio.create_task(maintain_lectures())
+    maintenance_tasks.add(task)
+    task.add_done_callback(maintenance_tasks.discard)
 
 # Security & Auth
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt costs 100-300 ms of CPU per call, so it runs on its own pool ("thread" or "process")
+PASSWORD_WORKERS = int(os.environ.get("PASSWORD_WORKERS", str(os.cpu_count() or 1)))
+PASSWORD_POOL = os.environ.get("PASSWORD_POOL", "thread")
+password_pool = PasswordPool(["bcrypt"], workers=PASSWORD_WORKERS, kind=PASSWORD_POOL)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
 # Models
@@ -104,16 +337,92 @@ class LectureMaterial(BaseModel):
 
 class CourseList(BaseModel):
     courses: List[CourseOut]
+    next_cursor: Optional[str] = None
 
 class LectureList(BaseModel):
     lectures: List[LectureOut]
+    course_name: Optional[str] = None
+    next_cursor: Optional[str] = None
+
+class TranscriptCue(BaseModel):
+    index: int
+    start: float
+    end: float
+    speaker: str = ""
+    text: str
+    confidence: List[int] = []
+
+class TranscriptRange(BaseModel):
+    start: float
+    end: float
+    duration: float
+    text: str
+    cues: List[TranscriptCue]
+
+class SlidePage(BaseModel):
+    page: int
+    text: str
+    start: float
+    end: float
+    timestamp: str
+
+class SlideMap(BaseModel):
+    slides: Optional[str] = None
+    pages: List[SlidePage]
+
+class SearchHit(BaseModel):
+    course_id: str
+    lecture_id: str
+    lecture_name: str
+    score: float
+    field: str
+    snippet: str
+    seconds: Optional[float] = None
+    timestamp: Optional[str] = None
+
+class SearchResults(BaseModel):
+    query: str
+    hits: List[SearchHit]
+
+class UploadSessionCreate(BaseModel):
+    filename: str
+    size: int
+
+class UploadSessionOut(BaseModel):
+    upload_id: str
+    offset: int
+    size: int
+    chunk_size: int
+
+class UploadedFile(BaseModel):
+    filename: str
+    path: str
+    url: str
+    size: int
+
+class JobStage(BaseModel):
+    name: str
+    status: str
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    duration: Optional[float] = None
+
+class JobOut(BaseModel):
+    job_id: str
+    status: str
+    stages: List[JobStage] = []
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    course_id: str
+    lecture_id: str
 
 # Utils
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def get_password_hash(password):
+    return await password_pool.hash(password)
 
-def verify_password(plain, hashed):
-    return pwd_context.verify(plain, hashed)
+async def verify_password(plain, hashed):
+    return await password_pool.verify(plain, hashed)
 
 def create_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
@@ -133,35 +442,106 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-    user = await get_user_by_email(email)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    user = user_cache.get(email)
+    if user is None:
+        user = await get_user_by_email(email)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        user_cache.put(email, user)
     return user
 
 # File storage paths
 UPLOAD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "uploads")
 AUDIO_DIR = os.path.join(UPLOAD_DIR, "audio")
 SLIDES_DIR = os.path.join(UPLOAD_DIR, "slides")
+# half-written uploads live here, outside the served uploads, until they are complete
+UPLOAD_STAGING_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "upload_staging")
 
 # Create directories if they don't exist
 os.makedirs(AUDIO_DIR, exist_ok=True)
 os.makedirs(SLIDES_DIR, exist_ok=True)
+os.makedirs(UPLOAD_STAGING_DIR, exist_ok=True)
+
+# Upload size limits, and how much of an upload is held in memory at a time
+MAX_AUDIO_BYTES = int(os.environ.get("MAX_AUDIO_MB", "500")) * 1024 * 1024
+MAX_SLIDES_BYTES = int(os.environ.get("MAX_SLIDES_MB", "100")) * 1024 * 1024
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+# save_file's temp files; a different suffix from resumable parts, which are swept by session
+SAVING_SUFFIX = ".saving"
 
 # File handling helpers
-async def save_file(file: UploadFile, directory: str) -> str:
-    """Save an uploaded file to a specified directory and return the file path"""
-    # Create a unique filename based on timestamp
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    file_extension = os.path.splitext(file.filename)[1]
-    safe_filename = f"{timestamp}{file_extension}"
-    file_path = os.path.join(directory, safe_filename)
-    
-    # Write the file
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+async def save_file(file: UploadFile, directory: str, max_bytes: int) -> str:
+    """
+    Save an uploaded file to a specified directory and return the file path
+    The file is streamed in chunks and named by the sha256 of its content, so
+    re-uploading the same slides or recording reuses the stored copy
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise HTTPException(status_code=413, detail=f"File is larger than {max_bytes // (1024 * 1024)} MB")
+
+    file_extension = safe_extension(file.filename)
+    digest = hashlib.sha256()
+    size = 0
+
+    # Write to a temp file in the staging directory, then rename once the hash is known
+    fd, tmp_path = tempfile.mkstemp(dir=UPLOAD_STAGING_DIR, suffix=SAVING_SUFFIX)
+    try:
+        with os.fdopen(fd, "wb") as buffer:
+            while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(status_code=413, detail=f"File is larger than {max_bytes // (1024 * 1024)} MB")
+                digest.update(chunk)
+                await asyncio.to_thread(buffer.write, chunk)
+
+        file_path = place_by_hash(tmp_path, digest.hexdigest(), file_extension, directory)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
     
     return file_path
 
+def safe_extension(filename: Optional[str]) -> str:
+    return re.sub(r"[^a-z0-9.]", "", os.path.splitext(filename or "")[1].lower())
+
+def place_by_hash(tmp_path: str, digest: str, file_extension: str, directory: str) -> str:
+    """Move a finished temp file to <digest><ext>; identical content already stored is reused."""
+    file_path = os.path.join(directory, f"{digest}{file_extension}")
+    if os.path.exists(file_path):
+        os.unlink(tmp_path)
+    else:
+        os.replace(tmp_path, file_path)
+    return file_path
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(UPLOAD_CHUNK_BYTES):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def slides_file(url: Optional[str]) -> Optional[str]:
+    """Path of an uploaded slide PDF from its /uploads/slides/ URL, or None"""
+    if not url or not url.startswith("/uploads/slides/") or not url.lower().endswith(".pdf"):
+        return None
+    path = os.path.join(SLIDES_DIR, os.path.basename(url))
+    return path if os.path.isfile(path) else None
+
+async def read_slides(path: str) -> List[str]:
+    # parsing happens in the extraction process pool; this thread only waits on it
+    return await asyncio.to_thread(slide_pages, path)
+
+# background slide extractions, held so they are not garbage collected mid-run
+slide_tasks = set()
+
+async def warm_slide_cache(path: str):
+    """Parse freshly uploaded slides in the background so notes and the slide map find them cached"""
+    try:
+        await read_slides(path)
+    except Exception as e:
+        print(f"Could not extract slides {path}: {e}")
+
 # Routes
 @app.post("/register", response_model=UserOut)
 async def register(user: UserCreate):
@@ -169,7 +549,7 @@ async def register(user: UserCreate):
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(user.password)
     user_dict = {
         "full_name": user.full_name,
         "email": user.email,
@@ -178,6 +558,7 @@ async def register(user: UserCreate):
 
     result = await users_collection.insert_one(user_dict)
     user_dict["_id"] = str(result.inserted_id)
+    user_cache.invalidate(user.email)
 
     return {
         "id": user_dict["_id"],
@@ -191,43 +572,65 @@ class LoginInput(BaseModel):
 @app.post("/login", response_model=Token)
 async def login(form_data: LoginInput):
     user = await get_user_by_email(form_data.username)
-    if not user or not verify_password(form_data.password, user["hashed_password"]):
+    if not user or not await verify_password(form_data.password, user["hashed_password"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    
+
+    # the user was just read, so the requests that follow the login find it cached
+    user_cache.put(user["email"], user)
     token = create_token(data={"sub": user["email"]}, expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     return {"access_token": token, "token_type": "bearer"}
 
 @app.get("/me", response_model=UserOut)
-async def me(token: str = Depends(oauth2_scheme)):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email = payload.get("sub")
-        if not email:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-    user = await get_user_by_email(email)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
+async def me(user: dict = Depends(get_current_user)):
     return {
         "id": str(user["_id"]),
         "full_name": user["full_name"],
         "email": user["email"]
     }
 
+@app.get("/metrics/passwords")
+async def password_metrics(current_user: dict = Depends(get_current_user)):
+    """
+    Queue depth and wait/run times of the password hashing pool
+    """
+    return password_pool.stats()
+
+@app.get("/metrics/outbound")
+async def outbound_metrics(current_user: dict = Depends(get_current_user)):
+    """
+    Outbound calls in flight and waiting for a slot, per host or API
+    """
+    return limiter_stats()
+
+# Keyset pagination on _id: a page is read straight off the index however deep it is
+async def fetch_page(collection, query: dict, projection: dict, cursor: Optional[str], limit: int):
+    """Return (documents, next_cursor) for the page after cursor; next_cursor is None on the last page."""
+    if cursor:
+        try:
+            query = {**query, "_id": {"$gt": ObjectId(cursor)}}
+        except:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    limit = max(1, min(limit, PAGE_SIZE_MAX))
+
+    # one extra document tells whether another page follows
+    docs = await collection.find(query, projection).sort("_id", ASCENDING).limit(limit + 1).to_list(length=limit + 1)
+    next_cursor = str(docs[limit - 1]["_id"]) if len(docs) > limit else None
+    return docs[:limit], next_cursor
+
 # Course and Lecture routes
 @app.get("/courses", response_model=CourseList)
-async def get_courses(current_user: dict = Depends(get_current_user)):
+async def get_courses(
+    cursor: Optional[str] = None,
+    limit: int = PAGE_SIZE_DEFAULT,
+    current_user: dict = Depends(get_current_user)
+):
     """
-    Get list of all courses with their IDs and names
+    Get a page of courses with their IDs and names
+    Pass the returned next_cursor as cursor to get the next page
     """
-    cursor = courses_collection.find({})
-    courses = []
-    async for doc in cursor:
-        courses.append({"course_id": str(doc["_id"]), "course_name": doc["course_name"]})
-    return {"courses": courses}
+    docs, next_cursor = await fetch_page(courses_collection, {}, {"course_name": 1}, cursor, limit)
+    courses = [{"course_id": str(doc["_id"]), "course_name": doc["course_name"]} for doc in docs]
+    return {"courses": courses, "next_cursor": next_cursor}
 
 @app.post("/courses", status_code=201)
 async def create_course(course: CourseCreate, current_user: dict = Depends(get_current_user)):
@@ -239,9 +642,15 @@ async def create_course(course: CourseCreate, current_user: dict = Depends(get_c
     return {"course_id": str(result.inserted_id), "message": "Course created successfully"}
 
 @app.get("/courses/{course_id}", response_model=LectureList)
-async def get_course_lectures(course_id: str, current_user: dict = Depends(get_current_user)):
+async def get_course_lectures(
+    course_id: str,
+    cursor: Optional[str] = None,
+    limit: int = PAGE_SIZE_DEFAULT,
+    current_user: dict = Depends(get_current_user)
+):
     """
-    Get list of all lectures for a specific course
+    Get a page of lectures for a specific course, along with the course name
+    Pass the returned next_cursor as cursor to get the next page
     """
     try:
         course_oid = ObjectId(course_id)
@@ -249,20 +658,15 @@ async def get_course_lectures(course_id: str, current_user: dict = Depends(get_c
         raise HTTPException(status_code=400, detail="Invalid course ID")
     
     # Check if course exists
-    course = await courses_collection.find_one({"_id": course_oid})
+    course = await courses_collection.find_one({"_id": course_oid}, {"course_name": 1})
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
     
-    # Get lectures for this course
-    cursor = lectures_collection.find({"course_id": course_id})
-    lectures = []
-    async for doc in cursor:
-        lectures.append({
-            "lecture_id": str(doc["_id"]), 
-            "lecture_name": doc["lecture_name"]
-        })
+    # Get lectures for this course; served by the (course_id, _id) index
+    docs, next_cursor = await fetch_page(lectures_collection, {"course_id": course_id}, {"lecture_name": 1}, cursor, limit)
+    lectures = [{"lecture_id": str(doc["_id"]), "lecture_name": doc["lecture_name"]} for doc in docs]
     
-    return {"lectures": lectures}
+    return {"lectures": lectures, "course_name": course.get("course_name"), "next_cursor": next_cursor}
 
 @app.post("/courses/{course_id}")
 async def create_note(
@@ -280,26 +684,35 @@ async def create_note(
         raise HTTPException(status_code=400, detail="Invalid course ID")
     
     # Check if course exists
-    course = await courses_collection.find_one({"_id": course_oid})
+    course = await courses_collection.find_one({"_id": course_oid}, {"_id": 1})
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
     
-    # Create lecture entry with all the note content
+    # Create lecture entry with all the note content; large fields go to the blob store
+    stored = await stored_materials({
+        "title": note.title,
+        "transcript": note.transcript,
+        "transcriptvtt": note.transcriptvtt,
+        "slides": note.slides,
+        "userNotes": note.userNotes,
+        "recording": note.recording,
+        "ai_note": note.ai_note
+    })
     lecture_data = {
         "lecture_name": note.title,
         "course_id": course_id,
-        "materials": {
-            "title": note.title,
-            "transcript": note.transcript,
-            "transcriptvtt": note.transcriptvtt,
-            "slides": note.slides,
-            "userNotes": note.userNotes,
-            "recording": note.recording,
-            "ai_note": note.ai_note
-        }
+        "materials": {key.split(".", 1)[1]: value for key, value in stored.items() if key.startswith("materials.")},
+        "search_text": {key.split(".", 1)[1]: value for key, value in stored.items() if key.startswith("search_text.")},
+        "search_indexed": True,
     }
     
     result = await lectures_collection.insert_one(lecture_data)
+    await index_lecture_terms(result.inserted_id, {
+        "transcript": note.transcript,
+        "transcriptvtt": note.transcriptvtt,
+        "userNotes": note.userNotes,
+        "ai_note": note.ai_note,
+    })
     return {
         "lecture_id": str(result.inserted_id)
     }
@@ -309,10 +722,12 @@ async def update_lecture_materials(
     course_id: str, 
     lecture_id: str, 
     materials: LectureMaterial,
+    refresh: bool = False,
     current_user: dict = Depends(get_current_user)
 ):
     """
     Update lecture materials (title, transcript, slides, userNotes, recording, ai_note)
+    Pass refresh=true to regenerate AI notes without reusing cached Gemini responses
     """
     try:
         lecture_oid = ObjectId(lecture_id)
@@ -323,44 +738,40 @@ async def update_lecture_materials(
     lecture = await lectures_collection.find_one({
         "_id": lecture_oid,
         "course_id": course_id
-    })
+    }, {"materials": 1, "ai_stages": 1, "ai_inputs": 1, "ai_job_id": 1})
     
     if not lecture:
         raise HTTPException(status_code=404, detail="Lecture not found or doesn't belong to specified course")
     
-    # save user notes to a file
-    user_notes_path = os.path.join(UPLOAD_DIR, "user_notes", f"{lecture_oid}.txt")
-    with open(user_notes_path, "w") as f:
-        f.write(materials.userNotes)
-    userNotes = user_notes_path
-
-    # save transcript to a file
-    transcript_path = os.path.join(UPLOAD_DIR, "transcripts", f"{lecture_oid}.txt")
-    with open(transcript_path, "w") as f:
-        f.write(materials.transcript)
-    transcript = transcript_path
-    
-    # save vtt file to a file
-    transcriptvtt_path = os.path.join(UPLOAD_DIR, "vtt", f"{lecture_oid}.vtt")
-    with open(transcriptvtt_path, "w") as f:
-        f.write(materials.transcriptvtt)
-    transcriptvtt = transcriptvtt_path
-    
-    ai_note = generate_notes(userNotes, transcript, transcriptvtt)
-        
-    # Update the materials
+    # Digest of every AI input after this update; None means the field is left as is.
+    # Compared by digest so stored blobs are not read
+    stored = lecture.get("materials", {})
+    inputs = {
+        field: content_digest(getattr(materials, field)) if getattr(materials, field) is not None
+        else stored_digest(stored.get(field, ""))
+        for field in AI_NOTE_INPUTS
+    }
+    # ai_inputs records what the stored ai_note and ai_stages were generated from, so a
+    # failed or cancelled run leaves them marked as out of date
+    produced = lecture.get("ai_inputs") or {}
+    changed = [
+        pipeline_input for field, pipeline_input in AI_NOTE_INPUTS.items()
+        if inputs[field] != produced.get(field)
+    ]
+
+    # Update the materials; ai_note is filled in by the background job
     update_data = {
-        "materials.title": materials.title,
-        "materials.transcript": materials.transcript,
-        "materials.transcriptvtt": materials.transcriptvtt,
-        "materials.slides": materials.slides,
-        "materials.userNotes": materials.userNotes,
-        "materials.recording": materials.recording,
-        "materials.ai_note": ai_note
+        "title": materials.title,
+        "transcript": materials.transcript,
+        "transcriptvtt": materials.transcriptvtt,
+        "slides": materials.slides,
+        "userNotes": materials.userNotes,
+        "recording": materials.recording,
     }
     
     # Remove None values
-    update_data = {k: v for k, v in update_data.items() if v is not None}
+    update_fields = {k: v for k, v in update_data.items() if v is not None}
+    update_data = await stored_materials(update_fields)
     
     if not update_data:
         return {"message": "No changes to update"}
@@ -370,20 +781,366 @@ async def update_lecture_materials(
         {"$set": update_data}
     )
     
-    if update_result.modified_count == 0:
+    if update_result.matched_count == 0:
         raise HTTPException(status_code=400, detail="Failed to update lecture materials")
+    # search entries are rebuilt only for the fields whose content is new
+    await index_lecture_terms(lecture_oid, {
+        field: value for field, value in update_fields.items()
+        if field in inputs and inputs[field] != stored_digest(stored.get(field, ""))
+    })
+
+    # Title, slide or recording edits leave the AI notes valid
+    if not refresh and not changed and stored.get("ai_note"):
+        return {"message": "Lecture materials updated successfully"}
+
+    async def current(field):
+        value = getattr(materials, field)
+        return value if value is not None else await from_stored(stored.get(field, ""))
+
+    # the pipeline reads its inputs from files, written by the job itself into a directory of its own
+    input_files = {
+        "user_notes.txt": await current("userNotes"),
+        "transcript.txt": await current("transcript"),
+        "transcript.vtt": await current("transcriptvtt"),
+    }
+
+    # slides are read straight from the upload directory
+    slides_path = slides_file(await current("slides")) or ""
+
+    # Stage outputs of the last run are reused for every stage whose inputs did not change
+    previous = None
+    if not refresh and lecture.get("ai_stages"):
+        previous = {name: await from_stored(value) for name, value in lecture["ai_stages"].items()}
+
+    async def store_ai_note(result):
+        ai_note, stages = result
+        # text stage outputs are as large as the notes themselves, so they go to the blob store too
+        update = await stored_materials({"ai_note": ai_note})
+        update["ai_stages"] = {name: await to_stored(value) for name, value in stages.items()}
+        update["ai_inputs"] = inputs
+        await lectures_collection.update_one({"_id": lecture_oid}, {"$set": update})
+        await index_lecture_terms(lecture_oid, {"ai_note": ai_note})
+
+    def run_job(job):
+        input_dir = tempfile.mkdtemp(dir=NOTE_INPUT_DIR)
+        try:
+            paths = {}
+            for name, text in input_files.items():
+                paths[name] = os.path.join(input_dir, name)
+                with open(paths[name], "w") as f:
+                    f.write(text)
+            return run_note_pipeline(
+                paths["user_notes.txt"], paths["transcript.txt"], paths["transcript.vtt"],
+                report=job.report, use_cache=not refresh, previous=previous, changed=changed, publish=job.publish,
+                slides_path=slides_path,
+            )
+        finally:
+            shutil.rmtree(input_dir, ignore_errors=True)
+
+    # a run still going for older inputs is stopped, so it cannot store notes over this one
+    if lecture.get("ai_job_id"):
+        job_manager.cancel(lecture["ai_job_id"])
+
+    job = job_manager.submit(
+        current_user["email"],
+        run_job,
+        on_success=store_ai_note,
+        course_id=course_id,
+        lecture_id=lecture_id,
+    )
+    await lectures_collection.update_one({"_id": lecture_oid}, {"$set": {"ai_job_id": job.id}})
     
-    return {"message": "Lecture materials updated successfully"}
+    return {"message": "Lecture materials updated, AI notes are being generated", "job_id": job.id}
+
+def get_user_job(job_id: str, current_user: dict):
+    job = job_manager.get(job_id)
+    if not job or job.owner != current_user["email"]:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs/{job_id}", response_model=JobOut)
+async def get_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """
+    Get the status and per-stage progress of a note generation job
+    """
+    return get_user_job(job_id, current_user).to_dict()
+
+@app.post("/jobs/{job_id}/cancel", response_model=JobOut)
+async def cancel_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """
+    Cancel a note generation job; the pipeline stops at its next stage boundary
+    """
+    get_user_job(job_id, current_user)
+    return job_manager.cancel(job_id).to_dict()
+
+def format_sse(event):
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+
+@app.get("/courses/{course_id}/{lecture_id}/notes/stream")
+async def stream_lecture_notes(
+    course_id: str,
+    lecture_id: str,
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Server-sent events for the lecture's AI note generation: each finished stage
+    output and web section as it is produced, ending with final_notes and a job event.
+    Without a running job the stored ai_note is sent as final_notes.
+    """
+    try:
+        lecture_oid = ObjectId(lecture_id)
+    except:
+        raise HTTPException(status_code=400, detail="Invalid lecture ID")
+
+    lecture = await lectures_collection.find_one(
+        {"_id": lecture_oid, "course_id": course_id},
+        {"ai_job_id": 1, "materials.ai_note": 1}
+    )
+    if not lecture:
+        raise HTTPException(status_code=404, detail="Lecture not found or doesn't belong to specified course")
+
+    job = job_manager.get(lecture.get("ai_job_id") or "")
+    if job and job.owner != current_user["email"]:
+        job = None
+
+    # EventSource resends the last id it saw when it reconnects
+    last_event_id = request.headers.get("last-event-id", "")
+    start = int(last_event_id) + 1 if last_event_id.isdigit() else 0
+
+    async def events():
+        if job is None:
+            ai_note = await from_stored(lecture.get("materials", {}).get("ai_note", ""))
+            yield format_sse({"id": 0, "event": "final_notes", "data": ai_note})
+            return
+        async for event in job.stream(start):
+            yield format_sse(event)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def get_transcript_index(lecture_oid: ObjectId, course_id: str):
+    """
+    Cue index for a lecture's VTT transcript. Only the stored digest is read
+    while the cached index is current; the transcript itself is loaded on a miss.
+    """
+    lecture = await lectures_collection.find_one(
+        {"_id": lecture_oid, "course_id": course_id},
+        {"materials.transcriptvtt_digest": 1}
+    )
+    if not lecture:
+        raise HTTPException(status_code=404, detail="Lecture not found or doesn't belong to specified course")
+
+    return await load_transcript_index(lecture_oid, lecture.get("materials", {}).get("transcriptvtt_digest"))
+
+async def load_transcript_index(lecture_oid: ObjectId, digest: Optional[str]):
+    key = str(lecture_oid)
+    index = transcript_indexes.get(key, digest) if digest else None
+    if index is None:
+        lecture = await lectures_collection.find_one({"_id": lecture_oid}, {"materials.transcriptvtt": 1})
+        transcriptvtt = await from_stored((lecture or {}).get("materials", {}).get("transcriptvtt", ""))
+        # parsing a long transcript takes tens of milliseconds, too long to hold the event loop
+        index = await asyncio.to_thread(CueIndex.from_text, transcriptvtt)
+        parsed_digest = vtt_digest(transcriptvtt)
+        transcript_indexes.put(key, parsed_digest, index)
+        if not digest and lecture:
+            # lectures saved before digests were kept get one now, so the next lookup hits the cache;
+            # a transcript written in the meantime brings its own digest and is left alone
+            await lectures_collection.update_one(
+                {"_id": lecture_oid, "materials.transcriptvtt_digest": {"$exists": False}},
+                {"$set": {"materials.transcriptvtt_digest": parsed_digest}},
+            )
+    return index
+
+@app.get("/courses/{course_id}/{lecture_id}/transcript", response_model=TranscriptRange)
+async def get_transcript_range(
+    course_id: str,
+    lecture_id: str,
+    start: float = 0,
+    end: Optional[float] = None,
+    at: Optional[float] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Transcript cues between start and end seconds, or the single cue spoken at `at`
+    """
+    try:
+        lecture_oid = ObjectId(lecture_id)
+    except:
+        raise HTTPException(status_code=400, detail="Invalid lecture ID")
+
+    index = await get_transcript_index(lecture_oid, course_id)
+
+    if at is not None:
+        cue = index.at(at)
+        cues = [cue] if cue else []
+        start = end = at
+    else:
+        if end is None:
+            end = index.duration
+        if end < start:
+            raise HTTPException(status_code=400, detail="end must not be before start")
+        cues = index.between(start, end)
+
+    return {
+        "start": start,
+        "end": end,
+        "duration": index.duration,
+        "text": " ".join(cue["text"] for cue in cues),
+        "cues": cues,
+    }
+
+@app.get("/courses/{course_id}/{lecture_id}/slides", response_model=SlideMap)
+async def get_slide_map(
+    course_id: str,
+    lecture_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Text of each slide page and the transcript time range it is discussed in,
+    so the slides can follow the recording and the recording can jump to a slide
+    """
+    try:
+        lecture_oid = ObjectId(lecture_id)
+    except:
+        raise HTTPException(status_code=400, detail="Invalid lecture ID")
+
+    lecture = await lectures_collection.find_one(
+        {"_id": lecture_oid, "course_id": course_id},
+        {"materials.slides": 1, "materials.transcriptvtt_digest": 1}
+    )
+    if not lecture:
+        raise HTTPException(status_code=404, detail="Lecture not found or doesn't belong to specified course")
+
+    materials = lecture.get("materials", {})
+    path = slides_file(materials.get("slides"))
+    if not path:
+        return {"slides": materials.get("slides") or None, "pages": []}
+
+    try:
+        pages = await read_slides(path)
+    except Exception as e:
+        print(f"Could not extract slides {path}: {e}")
+        raise HTTPException(status_code=422, detail="Slides could not be read")
+
+    index = await load_transcript_index(lecture_oid, materials.get("transcriptvtt_digest"))
+    mapped = await asyncio.to_thread(map_slides, pages, index)
+    return {
+        "slides": materials["slides"],
+        "pages": [{**slide, "text": text} for slide, text in zip(mapped, pages)],
+    }
+
+@app.get("/search", response_model=SearchResults)
+async def search_lectures(
+    q: str,
+    course_id: Optional[str] = None,
+    limit: int = 20,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Full-text search over lecture names, user notes, AI notes and transcripts,
+    in one course or across all of them. Hits are ranked by text score and
+    point at the [hh:mm:ss] where the match is discussed when it can be found.
+    """
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Search query is empty")
+    limit = max(1, min(limit, SEARCH_MAX_RESULTS))
+
+    query = {"$text": {"$search": q}}
+    if course_id:
+        query["course_id"] = course_id
+
+    # ranking happens in the index; snippets and times come from the top hits' term entries,
+    # so no materials are read and no transcript is parsed
+    lectures = await lectures_collection.find(query, {
+        "score": {"$meta": "textScore"},
+        "lecture_name": 1,
+        "course_id": 1,
+    }).sort([("score", {"$meta": "textScore"})]).limit(limit).to_list(length=limit)
+
+    pattern = term_pattern(q)
+    entries = defaultdict(list)
+    if pattern and lectures:
+        async for entry in lecture_terms_collection.find(
+            {"lecture_id": {"$in": [lecture["_id"] for lecture in lectures]}, "stem": {"$in": sorted(set(terms(q)))}},
+            {"_id": 0, "lecture_id": 1, "field": 1, "position": 1, "context": 1, "seconds": 1},
+        ):
+            entries[entry["lecture_id"]].append(entry)
+
+    hits = []
+    for lecture in lectures:
+        hit = lecture_hit(lecture, entries[lecture["_id"]], pattern) if pattern else {"field": "lecture_name", "snippet": "", "seconds": None}
+        hits.append({
+            "course_id": lecture["course_id"],
+            "lecture_id": str(lecture["_id"]),
+            "lecture_name": lecture.get("lecture_name", ""),
+            "score": lecture["score"],
+            "timestamp": format_timestamp(hit["seconds"]) if hit["seconds"] is not None else None,
+            **hit,
+        })
+
+    return {"query": q, "hits": hits}
+
+def materials_etag(materials: dict, wanted: List[str]) -> str:
+    """
+    Strong validator for a materials response, from the digests kept with each stored field,
+    so an unchanged lecture is recognised without reading its blobs
+    """
+    digest = hashlib.sha256()
+    for field in wanted:
+        digest.update(f"{field}:{stored_digest(materials.get(field, ''))};".encode("utf-8"))
+    return f'"{digest.hexdigest()[:32]}"'
+
+GZIP_ETAG_SUFFIX = "-gz"
+
+def gzip_etag(etag: str) -> str:
+    """The gzipped representation's own strong validator, as RFC 9110 requires one per content-coding"""
+    return etag[:-1] + GZIP_ETAG_SUFFIX + '"'
+
+def etag_match(if_none_match: Optional[str], etag: str) -> Optional[str]:
+    """The tag in If-None-Match naming a representation of etag (identity or gzip), or None"""
+    if not if_none_match:
+        return None
+    if if_none_match.strip() == "*":
+        return etag
+    for tag in if_none_match.split(","):
+        # GET uses the weak comparison, so a W/ prefix added by a proxy still matches
+        tag = tag.strip().removeprefix("W/")
+        if tag in (etag, gzip_etag(etag)):
+            return tag
+    return None
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    for coding in (accept_encoding or "").split(","):
+        name, _, params = coding.partition(";")
+        if name.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
 
 @app.get("/courses/{course_id}/{lecture_id}", response_model=LectureMaterial)
 async def get_lecture_materials(
     course_id: str, 
     lecture_id: str,
+    request: Request,
+    fields: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
     """
     Get lecture materials (title, transcript, slides, userNotes, recording, ai_note)
+    Pass fields as a comma-separated list to get only those; the rest come back as null
+    and large ones are never read from the blob store
+    Responses carry an ETag; If-None-Match with the current one gets 304 Not Modified,
+    and large bodies are gzipped when the client accepts it
     """
+    requested = set(fields.split(",")) if fields else set(LectureMaterial.model_fields)
+    unknown = requested - set(LectureMaterial.model_fields)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    wanted = [field for field in LectureMaterial.model_fields if field in requested]
+
     try:
         lecture_oid = ObjectId(lecture_id)
     except:
@@ -393,22 +1150,173 @@ async def get_lecture_materials(
     lecture = await lectures_collection.find_one({
         "_id": lecture_oid,
         "course_id": course_id
-    })
+    }, {f"materials.{field}": 1 for field in wanted})
     
     if not lecture:
         raise HTTPException(status_code=404, detail="Lecture not found or doesn't belong to specified course")
     
-    # Return the materials
     materials = lecture.get("materials", {})
-    return LectureMaterial(
-        title=materials.get("title", ""),
-        transcript=materials.get("transcript", ""),
-        transcriptvtt=materials.get("transcriptvtt", ""),
-        slides=materials.get("slides", ""),
-        userNotes=materials.get("userNotes", ""),
-        recording=materials.get("recording", ""),
-        ai_note=materials.get("ai_note", "")
-    )
+    # private: the materials belong to the signed-in user; no-cache: always revalidate with the ETag
+    etag = materials_etag(materials, wanted)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+    matched = etag_match(request.headers.get("if-none-match"), etag)
+    if matched:
+        # the 304 names the representation the client holds
+        return Response(status_code=304, headers={**headers, "ETag": matched})
+
+    # Return the materials, loading blob-backed ones in parallel
+    values = dict.fromkeys(LectureMaterial.model_fields)
+    values.update(zip(wanted, await asyncio.gather(*(from_stored(materials.get(field, "")) for field in wanted))))
+    body = LectureMaterial(**values).model_dump_json().encode("utf-8")
+
+    if len(body) >= GZIP_MIN_BYTES and accepts_gzip(request.headers.get("accept-encoding")):
+        body = await asyncio.to_thread(gzip.compress, body, 6)
+        headers["Content-Encoding"] = "gzip"
+        headers["ETag"] = gzip_etag(etag)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+# Resumable audio uploads: create a session, PUT chunks at offsets, check the offset after
+# a dropped connection, then complete. Chunks are appended to upload_staging/<upload_id>.part,
+# outside the served uploads, which is moved into uploads/audio under its content hash on completion
+# part files whose session has expired are deleted this often
+UPLOAD_SWEEP_INTERVAL = int(os.environ.get("UPLOAD_SWEEP_MINUTES", "60")) * 60
+upload_locks = defaultdict(asyncio.Lock)
+
+def upload_part_path(upload_id: str) -> str:
+    return os.path.join(UPLOAD_STAGING_DIR, f"{upload_id}.part")
+
+def sweep_saving_files():
+    """Delete save_file temp files left by a crash; one still being written was touched recently."""
+    cutoff = time.time() - UPLOAD_SWEEP_INTERVAL
+    for entry in os.scandir(UPLOAD_STAGING_DIR):
+        try:
+            if entry.name.endswith(SAVING_SUFFIX) and entry.stat().st_mtime < cutoff:
+                os.unlink(entry.path)
+        except FileNotFoundError:
+            pass
+
+async def sweep_upload_parts():
+    """Delete part files whose session is gone: expired by the TTL index, or left by a crash."""
+    await asyncio.to_thread(sweep_saving_files)
+    parts = {name[:-len(".part")]: name for name in os.listdir(UPLOAD_STAGING_DIR) if name.endswith(".part")}
+    if not parts:
+        return
+    live = {session["_id"] async for session in upload_sessions_collection.find({"_id": {"$in": list(parts)}}, {"_id": 1})}
+    for upload_id, name in parts.items():
+        if upload_id not in live:
+            async with upload_locks[upload_id]:
+                try:
+                    os.unlink(os.path.join(UPLOAD_STAGING_DIR, name))
+                except FileNotFoundError:
+                    pass
+            upload_locks.pop(upload_id, None)
+
+async def sweep_upload_parts_forever():
+    while True:
+        try:
+            await sweep_upload_parts()
+        except Exception as e:
+            print(f"Upload sweep failed: {e}")
+        await asyncio.sleep(UPLOAD_SWEEP_INTERVAL)
+
+upload_sweep_tasks = set()
+
+@app.on_event("startup")
+async def start_upload_sweep():
+    task = asyncio.create_task(sweep_upload_parts_forever())
+    upload_sweep_tasks.add(task)
+    task.add_done_callback(upload_sweep_tasks.discard)
+
+async def get_upload_session(upload_id: str, current_user: dict):
+    session = await upload_sessions_collection.find_one({"_id": upload_id, "owner": current_user["email"]})
+    if not session:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return session
+
+def upload_session_out(session: dict) -> dict:
+    path = upload_part_path(session["_id"])
+    return {
+        "upload_id": session["_id"],
+        "offset": os.path.getsize(path) if os.path.exists(path) else 0,
+        "size": session["size"],
+        "chunk_size": UPLOAD_SESSION_CHUNK_BYTES,
+    }
+
+@app.post("/api/uploads/audio", response_model=UploadSessionOut, status_code=201)
+async def create_audio_upload(upload: UploadSessionCreate, current_user: dict = Depends(get_current_user)):
+    """
+    Start a resumable upload of a recording of the given size
+    """
+    if upload.size < 0 or upload.size > MAX_AUDIO_BYTES:
+        raise HTTPException(status_code=413, detail=f"File is larger than {MAX_AUDIO_BYTES // (1024 * 1024)} MB")
+
+    session = {
+        "_id": uuid.uuid4().hex,
+        "owner": current_user["email"],
+        "extension": safe_extension(upload.filename),
+        "size": upload.size,
+        "created_at": datetime.utcnow(),
+    }
+    # the session goes in first, so the part file is never without one while the sweep runs
+    await upload_sessions_collection.insert_one(session)
+    open(upload_part_path(session["_id"]), "wb").close()
+    return upload_session_out(session)
+
+@app.get("/api/uploads/audio/{upload_id}", response_model=UploadSessionOut)
+async def get_audio_upload(upload_id: str, current_user: dict = Depends(get_current_user)):
+    """
+    How many bytes of an upload the server has; the client resumes from this offset
+    """
+    return upload_session_out(await get_upload_session(upload_id, current_user))
+
+@app.put("/api/uploads/audio/{upload_id}", response_model=UploadSessionOut)
+async def put_audio_upload_chunk(
+    upload_id: str,
+    offset: int,
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Append the request body at offset, which must equal the bytes received so far
+    Bytes that arrive before a connection drops are kept
+    """
+    session = await get_upload_session(upload_id, current_user)
+    path = upload_part_path(upload_id)
+
+    async with upload_locks[upload_id]:
+        current = os.path.getsize(path) if os.path.exists(path) else 0
+        if offset != current:
+            raise HTTPException(status_code=409, detail=f"Upload is at offset {current}, not {offset}")
+
+        with open(path, "ab") as f:
+            async for chunk in request.stream():
+                current += len(chunk)
+                if current > session["size"]:
+                    raise HTTPException(status_code=413, detail="Chunk goes past the declared upload size")
+                await asyncio.to_thread(f.write, chunk)
+
+    return upload_session_out(session)
+
+@app.post("/api/uploads/audio/{upload_id}/complete", response_model=UploadedFile)
+async def complete_audio_upload(upload_id: str, current_user: dict = Depends(get_current_user)):
+    """
+    Finish an upload once every byte has arrived; returns the stored recording
+    """
+    session = await get_upload_session(upload_id, current_user)
+    path = upload_part_path(upload_id)
+
+    async with upload_locks[upload_id]:
+        received = os.path.getsize(path) if os.path.exists(path) else 0
+        if received != session["size"]:
+            raise HTTPException(status_code=409, detail=f"Upload has {received} of {session['size']} bytes")
+
+        digest = await asyncio.to_thread(hash_file, path)
+        file_path = place_by_hash(path, digest, session["extension"], AUDIO_DIR)
+        await upload_sessions_collection.delete_one({"_id": upload_id})
+    upload_locks.pop(upload_id, None)
+
+    filename = os.path.basename(file_path)
+    return {"filename": filename, "path": file_path, "url": f"/uploads/audio/{filename}", "size": received}
 
 @app.post("/api/lectures/save")
 async def save_lecture_files(
@@ -419,10 +1327,12 @@ async def save_lecture_files(
     timestamps: Optional[str] = Form(None),
     courseId: Optional[str] = Form(None),
     lectureId: Optional[str] = Form(None),
+    recording: Optional[str] = Form(None),
     current_user: dict = Depends(get_current_user)
 ):
     """
     Save lecture files (audio recording and slides) to the server.
+    A recording sent through the resumable upload API is passed by its filename as recording.
     Returns file paths and lecture data.
     """
     file_paths = {}
@@ -434,23 +1344,34 @@ async def save_lecture_files(
         # Save audio file if provided
         audio_path = None
         if audio:
-            audio_path = await save_file(audio, AUDIO_DIR)
+            audio_path = await save_file(audio, AUDIO_DIR, MAX_AUDIO_BYTES)
             file_paths["audio"] = audio_path
             # Create URL path for frontend
             audio_url = f"/uploads/audio/{os.path.basename(audio_path)}"
             response_data.recording = audio_url
+        elif recording:
+            audio_path = os.path.join(AUDIO_DIR, os.path.basename(recording))
+            if not os.path.isfile(audio_path) or audio_path.endswith(".part"):
+                raise HTTPException(status_code=400, detail="Uploaded recording not found")
+            file_paths["audio"] = audio_path
+            response_data.recording = f"/uploads/audio/{os.path.basename(audio_path)}"
         
         # Save slides file if provided
         slides_path = None
         if slides:
-            slides_path = await save_file(slides, SLIDES_DIR)
+            slides_path = await save_file(slides, SLIDES_DIR, MAX_SLIDES_BYTES)
             file_paths["slides"] = slides_path
             # Create URL path for frontend
             slides_url = f"/uploads/slides/{os.path.basename(slides_path)}"
             response_data.slides = slides_url
+            if slides_file(slides_url):
+                task = asyncio.create_task(warm_slide_cache(slides_path))
+                slide_tasks.add(task)
+                task.add_done_callback(slide_tasks.discard)
         
-        # Process transcript
+        # Process transcript; the lecture document only keeps a blob reference when it is large
         response_data.transcript = transcript
+        stored_transcript = await to_stored(transcript)
         
         # Process timestamps if provided
         timestamp_data = []
@@ -471,7 +1392,7 @@ async def save_lecture_files(
                     lecture = await lectures_collection.find_one({
                         "_id": lecture_oid,
                         "course_id": courseId
-                    })
+                    }, {"materials.note": 1, "materials.ai_note": 1})
                     
                     if lecture:
                         # Update the lecture materials
@@ -482,11 +1403,13 @@ async def save_lecture_files(
                                     "note": lecture.get("materials", {}).get("note", ""),
                                     "recording": response_data.recording,
                                     "slides": response_data.slides,
-                                    "transcript": response_data.transcript,
+                                    "transcript": stored_transcript,
                                     "ai_note": lecture.get("materials", {}).get("ai_note", "")
-                                }
+                                },
+                                "search_text.transcript": index_terms(transcript)
                             }}
                         )
+                        await index_lecture_terms(lecture_oid, {"transcript": transcript})
                 except Exception as e:
                     print(f"Failed to update lecture in database: {str(e)}")
             else:
@@ -499,14 +1422,17 @@ async def save_lecture_files(
                             "note": "",
                             "recording": response_data.recording,
                             "slides": response_data.slides,
-                            "transcript": response_data.transcript,
+                            "transcript": stored_transcript,
                             "ai_note": ""
                         },
+                        "search_text": {"transcript": index_terms(transcript)},
+                        "search_indexed": True,
                         "timestamps": timestamp_data
                     }
                     
                     result = await lectures_collection.insert_one(lecture_data)
                     lectureId = str(result.inserted_id)
+                    await index_lecture_terms(result.inserted_id, {"transcript": transcript})
                 except Exception as e:
                     print(f"Failed to create lecture in database: {str(e)}")
         
@@ -516,6 +1442,8 @@ async def save_lecture_files(
             "response": response_data.dict()
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save lecture files: {str(e)}")
 
@@ -0,0 +1,97 @@
+"""
+Accuracy and speed of the local timestamp aligner on the sample transcript.
+
+    python benchmarks/benchmark_align.py [path/to/transcript.vtt]
+
+Two checks:
+- labelled: an outline written by hand while reading the sample lecture, with
+  the time each topic starts, aligned as a whole the way the pipeline does it;
+  a hit is within TOLERANCE seconds.
+- synthetic: headings built from a few distinctive words of a random stretch
+  of cues, in shuffled order; a hit lands inside that stretch (give or take a window).
+"""
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from align import Aligner, WINDOW_CUES, terms
+from vtt import CueIndex, parse_timestamp
+
+DEFAULT_VTT = os.path.join(os.path.dirname(__file__), "..", "..", "transcripts", "transcript.vtt")
+TOLERANCE = 90
+SYNTHETIC_ITEMS = 200
+SYNTHETIC_SPAN = 6
+SYNTHETIC_WORDS = 4
+
+# (heading, time the topic starts) for transcripts/transcript.vtt
+LABELLED = [
+    ("1. Announcements: project 1 due tonight", "00:00:02"),
+    ("Conditional independence", "00:06:11"),
+    ("Denoising diffusion probabilistic models (DDPM)", "00:40:54"),
+    ("Forward process: defining Q of XT given XT minus 1", "01:02:12"),
+    ("Choosing the noise schedule beta T and cosine annealing", "01:27:24"),
+    ("Why the reverse process is parameterized as a normal distribution", "01:35:42"),
+    ("The ELBO derivation", "01:38:12"),
+]
+
+
+def labelled(aligner):
+    outline = "\n".join(f"<h2>{heading}</h2>" for heading, _ in LABELLED)
+    stamps = re.findall(r"<h2>\[(\d+:\d+:\d+)\]", aligner.align(outline))
+    hits = 0
+    for (heading, expected), found in zip(LABELLED, stamps):
+        ok = abs(parse_timestamp(found) - parse_timestamp(expected)) <= TOLERANCE
+        hits += ok
+        print(f"  {'ok  ' if ok else 'MISS'} [{expected}] -> [{found}]  {heading}")
+    return hits, len(LABELLED)
+
+
+def synthetic(aligner, seed=0):
+    index = aligner.index
+    rng = random.Random(seed)
+    hits = total = 0
+    for _ in range(SYNTHETIC_ITEMS):
+        first = rng.randrange(0, len(index) - SYNTHETIC_SPAN)
+        stretch = index.text[index.text_offsets[first]:index.text_offsets[first + SYNTHETIC_SPAN]]
+        words = sorted(set(terms(stretch)), key=lambda term: -aligner.idf.get(term, 0))[:SYNTHETIC_WORDS]
+        if len(words) < SYNTHETIC_WORDS:
+            continue
+        rng.shuffle(words)
+        cue = aligner.locate(" ".join(words))
+        total += 1
+        hits += cue is not None and first - WINDOW_CUES <= cue < first + SYNTHETIC_SPAN
+    return hits, total
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_VTT
+
+    started = time.perf_counter()
+    index = CueIndex.from_file(path)
+    parsed = time.perf_counter()
+    aligner = Aligner(index)
+    built = time.perf_counter()
+    print(f"{len(index)} cues, parse {1000 * (parsed - started):.1f}ms, index {1000 * (built - parsed):.1f}ms")
+
+    if os.path.abspath(path) == os.path.abspath(DEFAULT_VTT):
+        print("labelled headings:")
+        hits, total = labelled(aligner)
+        print(f"labelled accuracy: {hits}/{total} within {TOLERANCE}s")
+
+    started = time.perf_counter()
+    hits, total = synthetic(aligner)
+    elapsed = time.perf_counter() - started
+    print(f"synthetic accuracy: {hits}/{total} ({100 * hits / max(total, 1):.1f}%), {1000 * elapsed / max(total, 1):.2f}ms per heading")
+
+    outline = "\n".join(f"<h2>{heading}</h2>" for heading, _ in LABELLED)
+    started = time.perf_counter()
+    aligner.align(outline)
+    print(f"aligned a {len(LABELLED)} heading outline in {1000 * (time.perf_counter() - started):.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
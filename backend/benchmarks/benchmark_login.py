@@ -0,0 +1,79 @@
+"""
+Login throughput and event-loop responsiveness with bcrypt inline versus on the password pool.
+
+    python benchmarks/benchmark_login.py [logins] [workers]
+
+A burst of concurrent logins each verifies one bcrypt hash, as /login does,
+while a heartbeat coroutine asks to wake every HEARTBEAT seconds. Its lateness
+is how long any other request would have waited for the loop:
+- inline: verify() called straight from the coroutine, as the handlers used to.
+- thread / process: verify() awaited on a PasswordPool of the given size.
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from passwords import PasswordPool, _context
+
+SCHEMES = ("bcrypt",)
+PASSWORD = "correct horse battery staple"
+HEARTBEAT = 0.005
+
+
+async def heartbeat(lags, stop):
+    while not stop.is_set():
+        expected = time.perf_counter() + HEARTBEAT
+        await asyncio.sleep(HEARTBEAT)
+        lags.append(max(0.0, time.perf_counter() - expected))
+
+
+async def burst(verify, hashed, logins):
+    lags = []
+    stop = asyncio.Event()
+    beat = asyncio.create_task(heartbeat(lags, stop))
+    await asyncio.sleep(HEARTBEAT * 2)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(verify(PASSWORD, hashed) for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await beat
+    assert all(results)
+    lags.sort()
+    return elapsed, (lags[-1] if lags else 0.0), (lags[int(len(lags) * 0.99) - 1] if lags else 0.0)
+
+
+def report(name, logins, elapsed, max_lag, p99_lag):
+    print(f"  {name:<8} {logins / elapsed:7.1f} logins/s   loop lag max {max_lag * 1000:7.1f} ms   p99 {p99_lag * 1000:7.1f} ms")
+
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    hashed = _context(SCHEMES).hash(PASSWORD)
+    print(f"{logins} concurrent logins, {workers} workers, {os.cpu_count()} cores")
+
+    async def inline(plain, hashed):
+        return _context(SCHEMES).verify(plain, hashed)
+
+    report("inline", logins, *asyncio.run(burst(inline, hashed, logins)))
+
+    for kind in ("thread", "process"):
+        async def pooled():
+            pool = PasswordPool(SCHEMES, workers=workers, kind=kind)
+            # the first call starts the workers; that cost is not part of a login
+            await pool.verify(PASSWORD, hashed)
+            measured = await burst(pool.verify, hashed, logins)
+            return measured, pool.stats()
+
+        measured, stats = asyncio.run(pooled())
+        report(kind, logins, *measured)
+        print(f"           max queued {stats['max_queued']}, avg wait {stats['avg_wait_ms']} ms, avg run {stats['avg_run_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import gzip
+import hashlib
+import os
+import re
+import tempfile
+import time
+
+# kept outside uploads/, which is served publicly
+DEFAULT_BLOB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "blobs")
+
+DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def content_digest(text):
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+class BlobStore:
+    """
+    Content-addressed text store on local disk. Each blob is named by the
+    sha256 of its text and stored gzipped, so identical transcripts or notes
+    take the space of one. Writes go through a temp file and a rename, so a
+    reader never sees a partial blob.
+    """
+
+    def __init__(self, root=DEFAULT_BLOB_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, digest):
+        if not DIGEST_RE.match(digest):
+            raise ValueError(f"Invalid blob digest: {digest!r}")
+        return os.path.join(self.root, digest[:2], digest + ".gz")
+
+    def put(self, text):
+        """Store text and return its digest."""
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        try:
+            # a blob written again counts as new, so a sweep running meanwhile leaves it alone
+            os.utime(path)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(gzip.compress(data, compresslevel=6))
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        return digest
+
+    def get(self, digest):
+        with open(self._path(digest), "rb") as f:
+            return gzip.decompress(f.read()).decode("utf-8")
+
+    def exists(self, digest):
+        return os.path.exists(self._path(digest))
+
+    def delete(self, digest):
+        try:
+            os.unlink(self._path(digest))
+        except FileNotFoundError:
+            pass
+
+    def sweep(self, referenced, grace=3600):
+        """
+        Delete every blob whose digest is not in referenced. Blobs written in
+        the last grace seconds are kept, since the document pointing at them
+        may not be saved yet. Returns the number deleted.
+        """
+        cutoff = time.time() - grace
+        deleted = 0
+        for directory in os.listdir(self.root):
+            if not os.path.isdir(os.path.join(self.root, directory)):
+                continue
+            for name in os.listdir(os.path.join(self.root, directory)):
+                digest = name[:-len(".gz")]
+                if not name.endswith(".gz") or not DIGEST_RE.match(digest) or digest in referenced:
+                    continue
+                path = os.path.join(self.root, directory, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.unlink(path)
+                        deleted += 1
+                except FileNotFoundError:
+                    pass
+        return deleted
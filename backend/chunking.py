@@ -0,0 +1,85 @@
+import re
+
+# rough size of a token for English text; close enough to keep requests under a budget
+CHARS_PER_TOKEN = 4
+
+PARAGRAPH_RE = re.compile(r"\n\s*\n")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _pieces(text, max_tokens, separators):
+    """Split text at the coarsest separator that brings every piece under max_tokens."""
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+    if not separators:
+        step = max_tokens * CHARS_PER_TOKEN
+        return [text[i:i + step] for i in range(0, len(text), step)]
+    pieces = []
+    for part in separators[0].split(text):
+        if part.strip():
+            pieces.extend(_pieces(part, max_tokens, separators[1:]))
+    return pieces
+
+
+def _pack(pieces, max_tokens, joiner):
+    """Greedily join consecutive pieces while they fit max_tokens."""
+    chunks = []
+    current = []
+    size = 0
+    for piece in pieces:
+        tokens = estimate_tokens(piece)
+        if current and size + tokens > max_tokens:
+            chunks.append(joiner.join(current))
+            current, size = [], 0
+        current.append(piece)
+        size += tokens
+    if current:
+        chunks.append(joiner.join(current))
+    return chunks
+
+
+def chunk_text(text, max_tokens):
+    """Chunks of at most max_tokens, split at paragraphs, then sentences, then anywhere."""
+    return _pack(_pieces(text, max_tokens, [PARAGRAPH_RE, SENTENCE_RE]), max_tokens, "\n\n")
+
+
+def chunk_sources(sources, max_tokens):
+    """
+    Pack (label, text) sources into "label: text" chunks of at most max_tokens.
+    Sources are kept whole where they fit; a longer source is split at
+    paragraph and sentence boundaries and each part keeps its label, so every
+    chunk still says where its text came from.
+    """
+    pieces = []
+    for label, text in sources:
+        prefix = f"{label}: "
+        budget = max(max_tokens - estimate_tokens(prefix), 1)
+        pieces.extend(prefix + part for part in chunk_text(text, budget))
+    return _pack(pieces, max_tokens, "\n")
+
+
+def reduce_hierarchically(parts, combine, max_tokens, map_concurrently, fan_in=8):
+    """
+    Combine parts until what is left fits one request of max_tokens.
+    Each round groups neighbouring parts (at most fan_in per group, within the
+    budget) and runs combine(list_of_parts) on the groups in parallel, so
+    latency grows with the depth of the tree rather than the number of parts.
+    map_concurrently(func, items) applies func to items and keeps their order.
+    """
+    parts = list(parts)
+    while len(parts) > 1 and sum(estimate_tokens(part) for part in parts) > max_tokens:
+        groups = []
+        for part in parts:
+            if groups and len(groups[-1]) < fan_in and sum(map(estimate_tokens, groups[-1] + [part])) <= max_tokens:
+                groups[-1].append(part)
+            else:
+                groups.append([part])
+        if len(groups) == len(parts):
+            # nothing fits together; pair parts up so every round still shrinks the list
+            groups = [parts[i:i + 2] for i in range(0, len(parts), 2)]
+        parts = map_concurrently(combine, groups)
+    return parts
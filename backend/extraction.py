@@ -0,0 +1,173 @@
+import io
+import os
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from html.parser import HTMLParser
+
+# processes for CPU-bound document parsing; a large PDF would otherwise hold a
+# request or pipeline thread (and the GIL) for as long as it takes to parse
+EXTRACT_WORKERS = int(os.getenv('EXTRACT_WORKERS', str(min(4, os.cpu_count() or 1))))
+# address space cap per worker, so one pathological document cannot exhaust memory; 0 disables it
+EXTRACT_MEMORY_MB = int(os.getenv('EXTRACT_MEMORY_MB', '1024'))
+# time a worker waits for an answer beyond the document's own deadline before giving up on it
+EXTRACT_GRACE_SECONDS = 5
+
+# elements whose text is never part of the readable page
+SKIPPED_TAGS = frozenset(("script", "style", "noscript", "template", "svg", "iframe", "object"))
+# elements that end a run of text, so words either side are not glued together
+BREAK_TAGS = frozenset((
+    "p", "div", "br", "li", "tr", "td", "th", "h1", "h2", "h3", "h4", "h5", "h6",
+    "section", "article", "header", "footer", "pre", "blockquote", "dd", "dt", "hr",
+))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _limit_worker():
+    if EXTRACT_MEMORY_MB > 0:
+        try:
+            import resource
+            limit = EXTRACT_MEMORY_MB * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError):
+            pass
+
+
+def extraction_pool():
+    """The shared process pool, started on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=EXTRACT_WORKERS, initializer=_limit_worker)
+        return _pool
+
+
+def _retire_pool(pool):
+    """
+    Replace pool with a fresh one on next use and stop its workers. Calls
+    still running on it fail with BrokenProcessPool and are retried by
+    extract(); a worker that has crashed or hung is never reused.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    # the executor cannot stop a single worker, so a hung one takes the pool with it
+    for process in list((getattr(pool, "_processes", None) or {}).values()):
+        process.kill()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _alarm(signum, frame):
+    raise TimeoutError("document extraction timed out")
+
+
+def _with_deadline(seconds, func, args):
+    # runs in a worker process, where the task owns the main thread and so can use SIGALRM
+    if not seconds or not hasattr(signal, "setitimer"):
+        return func(*args)
+    previous = signal.signal(signal.SIGALRM, _alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        return func(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _run(pool, func, args, timeout):
+    future = pool.submit(_with_deadline, timeout, func, args)
+    try:
+        return future.result(timeout=timeout + EXTRACT_GRACE_SECONDS if timeout else None)
+    except TimeoutError:
+        # the worker ignored its own deadline, e.g. stuck in C code
+        if not future.done():
+            _retire_pool(pool)
+        raise
+
+
+def extract(func, *args, timeout=None):
+    """
+    Run func(*args) in the extraction pool and return its result. The worker
+    abandons the document after timeout seconds and TimeoutError is raised
+    here, so a slow document costs its deadline rather than a stalled caller.
+    A worker still busy after the grace period is killed. When the pool
+    breaks (a worker hit its memory cap, crashed or was killed) it is
+    replaced, and the call is retried once in a process of its own.
+    """
+    pool = extraction_pool()
+    try:
+        return _run(pool, func, args, timeout)
+    except BrokenProcessPool:
+        _retire_pool(pool)
+    # alone, so a document that kills its worker cannot take the shared pool down again
+    retry = ProcessPoolExecutor(max_workers=1, initializer=_limit_worker)
+    try:
+        return _run(retry, func, args, timeout)
+    finally:
+        retry.shutdown(wait=False)
+
+
+def pdf_pages(source, max_pages=0):
+    """
+    Text of each page of a PDF, given a path or the file's bytes, with
+    whitespace collapsed. max_pages=0 reads every page. Meant to run in
+    extraction_pool().
+    """
+    from pdfminer.high_level import extract_pages
+    from pdfminer.layout import LTTextContainer
+
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    pages = []
+    for layout in extract_pages(source, maxpages=max_pages):
+        text = " ".join(element.get_text() for element in layout if isinstance(element, LTTextContainer))
+        pages.append(" ".join(text.split()))
+    return pages
+
+
+def pdf_text(data, max_pages=0):
+    return "\n\n".join(page for page in pdf_pages(data, max_pages) if page)
+
+
+class _TextCollector(HTMLParser):
+    """Collects the readable text of a page in one pass, without building a tree."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self.skipping += 1
+        elif tag in BREAK_TAGS:
+            self.parts.append("\n")
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in BREAK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS:
+            self.skipping = max(0, self.skipping - 1)
+        elif tag in BREAK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.parts.append(data)
+
+
+def html_text(data, encoding=None):
+    """Readable text of an HTML document given as bytes or str; scripts, styles and markup are dropped."""
+    if isinstance(data, bytes):
+        data = data.decode(encoding or "utf-8", errors="replace")
+    collector = _TextCollector()
+    collector.feed(data)
+    collector.close()
+    lines = (" ".join(line.split()) for line in "".join(collector.parts).split("\n"))
+    return " ".join(line for line in lines if line)
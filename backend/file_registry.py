@@ -0,0 +1,59 @@
+import os
+import sqlite3
+import threading
+import time
+
+from llm_cache import CACHE_DIR
+
+DEFAULT_REGISTRY_PATH = os.path.join(CACHE_DIR, "gemini_uploads.sqlite3")
+
+# Gemini keeps uploaded files for 48 hours
+DEFAULT_FILE_LIFETIME = 47 * 3600
+
+
+class UploadRegistry:
+    """
+    Remembers which file contents are already uploaded to Gemini, keyed by
+    content hash, so unchanged inputs reuse the remote file until it expires.
+    """
+
+    def __init__(self, path=DEFAULT_REGISTRY_PATH, expiry_margin=3600):
+        # a handle is only reused while it has at least expiry_margin seconds left,
+        # so it cannot expire halfway through a pipeline run
+        self.expiry_margin = expiry_margin
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS uploads ("
+            " digest TEXT PRIMARY KEY, name TEXT NOT NULL, uri TEXT NOT NULL, mime_type TEXT NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, digest):
+        """Return {"name", "uri", "mime_type"} for a live upload of this content, else None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT name, uri, mime_type, expires_at FROM uploads WHERE digest = ?", (digest,)
+            ).fetchone()
+        if row is None or row[3] - self.expiry_margin < time.time():
+            return None
+        return {"name": row[0], "uri": row[1], "mime_type": row[2]}
+
+    def put(self, digest, uploaded):
+        """Record a genai File returned by client.files.upload."""
+        expiration = getattr(uploaded, "expiration_time", None)
+        expires_at = expiration.timestamp() if expiration else time.time() + DEFAULT_FILE_LIFETIME
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO uploads (digest, name, uri, mime_type, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (digest, uploaded.name, uploaded.uri, uploaded.mime_type, expires_at),
+            )
+            self._conn.execute("DELETE FROM uploads WHERE expires_at < ?", (time.time(),))
+            self._conn.commit()
+
+    def forget(self, digest):
+        with self._lock:
+            self._conn.execute("DELETE FROM uploads WHERE digest = ?", (digest,))
+            self._conn.commit()
@@ -0,0 +1,301 @@
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+# Every outbound call goes through a Limiter for its host or API: a cap on calls
+# in flight plus a token bucket on the rate they start at. 429 and 5xx answers
+# are retried with exponential backoff and jitter, honouring Retry-After.
+
+# keep-alive connections kept per host by the shared session
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '20'))
+# connect and read timeout for outbound requests, in seconds
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', '10'))
+# default limits for a host with no entry in API_LIMITS
+HOST_CONCURRENCY = int(os.getenv('HOST_CONCURRENCY', '4'))
+HOST_RATE = float(os.getenv('HOST_RATE', '5'))
+# retries after a 429 or 5xx, and the backoff before the first one (doubled each time, capped)
+HTTP_RETRIES = int(os.getenv('HTTP_RETRIES', '4'))
+BACKOFF_BASE = float(os.getenv('HTTP_BACKOFF_BASE', '0.5'))
+BACKOFF_MAX = float(os.getenv('HTTP_BACKOFF_MAX', '30'))
+
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+# (concurrency, requests per second) per API; raise these to the provider quota
+API_LIMITS = {
+    "gemini": (int(os.getenv('GEMINI_CONCURRENCY', '8')), float(os.getenv('GEMINI_RPS', '4'))),
+    "google-search": (1, float(os.getenv('GOOGLE_SEARCH_RPS', '0.3'))),
+    "www.googleapis.com": (int(os.getenv('CSE_CONCURRENCY', '5')), float(os.getenv('CSE_RPS', '5'))),
+}
+
+# shared across an event loop's lifetime by image lookups
+ASYNC_LIMITS = httpx.Limits(max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE // 2)
+ASYNC_TIMEOUT = httpx.Timeout(HTTP_TIMEOUT)
+
+
+class TokenBucket:
+    """Allows rate starts per second on average and bursts of up to burst."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token and return how long to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class Slots:
+    """
+    Counting semaphore shared by threads and event loops. A release hands
+    the slot straight to the longest waiter: a thread is woken through its
+    Event, a coroutine through its future on its own loop, so nobody polls.
+    """
+
+    def __init__(self, count):
+        self._free = count
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return
+            handed = threading.Event()
+            self._waiters.append(handed)
+        handed.wait()
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return
+            future = loop.create_future()
+            waiter = (loop, future)
+            self._waiters.append(waiter)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    raise
+            # the slot was handed over as the task was cancelled; pass it on. A handover
+            # still on its way finds the future cancelled and passes it on itself
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def _hand_over(self, future):
+        # runs on the waiter's loop
+        if future.done():
+            self.release()
+        else:
+            future.set_result(None)
+
+    def release(self):
+        with self._lock:
+            if not self._waiters:
+                self._free += 1
+                return
+            waiter = self._waiters.popleft()
+        if isinstance(waiter, threading.Event):
+            waiter.set()
+        else:
+            loop, future = waiter
+            loop.call_soon_threadsafe(self._hand_over, future)
+
+
+class Limiter:
+    """
+    Concurrency cap and token bucket for one host or API. The same limiter
+    serves worker threads and event loops, so every caller shares the quota.
+    """
+
+    def __init__(self, name, concurrency, rate):
+        self.name = name
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(rate)
+        self._slots = Slots(concurrency)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+
+    def _count(self, waiting=0, in_flight=0):
+        with self._lock:
+            self.waiting += waiting
+            self.in_flight += in_flight
+
+    @contextmanager
+    def slot(self):
+        self._count(waiting=1)
+        try:
+            self._slots.acquire()
+        finally:
+            self._count(waiting=-1)
+        self._count(in_flight=1)
+        try:
+            time.sleep(self.bucket.reserve())
+            yield
+        finally:
+            self._count(in_flight=-1)
+            self._slots.release()
+
+    @asynccontextmanager
+    async def async_slot(self):
+        self._count(waiting=1)
+        try:
+            await self._slots.acquire_async()
+        finally:
+            self._count(waiting=-1)
+        self._count(in_flight=1)
+        try:
+            await asyncio.sleep(self.bucket.reserve())
+            yield
+        finally:
+            self._count(in_flight=-1)
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {"concurrency": self.concurrency, "in_flight": self.in_flight, "waiting": self.waiting}
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def limiter(key):
+    """The shared Limiter for an API name from API_LIMITS or a host name."""
+    with _limiters_lock:
+        if key not in _limiters:
+            concurrency, rate = API_LIMITS.get(key, (HOST_CONCURRENCY, HOST_RATE))
+            _limiters[key] = Limiter(key, concurrency, rate)
+        return _limiters[key]
+
+
+def limiter_stats():
+    """Calls in flight and waiting per host or API, for metrics."""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
+
+
+def host_limiter(url):
+    return limiter(urlsplit(url).hostname or "")
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Seconds before retry number attempt (0-based): Retry-After if given, else capped exponential with full jitter."""
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX)
+        except ValueError:
+            try:
+                return min(max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time()), BACKOFF_MAX)
+            except (TypeError, ValueError):
+                pass
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def session():
+    """Process-wide requests.Session with a keep-alive pool per host."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+def _release_on_close(response, release):
+    # release is an ExitStack's close, so a second close() does not free the slot twice
+    close = response.close
+
+    def close_and_release():
+        try:
+            close()
+        finally:
+            release()
+
+    response.close = close_and_release
+
+
+def get(url, retries=HTTP_RETRIES, **kwargs):
+    """
+    GET through the shared session within the host's limits, retrying 429
+    and 5xx answers. Takes the keyword arguments of requests; the timeout
+    defaults to HTTP_TIMEOUT. A streamed response keeps its slot until the
+    caller closes it, so the body download counts against the host's cap.
+    """
+    kwargs.setdefault("timeout", HTTP_TIMEOUT)
+    host = host_limiter(url)
+    for attempt in range(retries + 1):
+        with ExitStack() as held:
+            held.enter_context(host.slot())
+            response = session().get(url, **kwargs)
+            if kwargs.get("stream"):
+                _release_on_close(response, held.pop_all().close)
+        if response.status_code not in RETRY_STATUSES or attempt == retries:
+            return response
+        delay = backoff_delay(attempt, response.headers.get("Retry-After"))
+        response.close()
+        print(f"{host.name} answered {response.status_code}, retrying in {delay:.1f}s", file=sys.stderr)
+        time.sleep(delay)
+
+
+async def request_async(client, method, url, retries=HTTP_RETRIES, **kwargs):
+    """Like get(), for an httpx.AsyncClient and any method; the backoff waits on the event loop."""
+    host = host_limiter(url)
+    for attempt in range(retries + 1):
+        async with host.async_slot():
+            response = await client.request(method, url, **kwargs)
+        if response.status_code not in RETRY_STATUSES or attempt == retries:
+            return response
+        delay = backoff_delay(attempt, response.headers.get("Retry-After"))
+        print(f"{host.name} answered {response.status_code}, retrying in {delay:.1f}s", file=sys.stderr)
+        await asyncio.sleep(delay)
+
+
+def call_with_backoff(key, func, is_retryable, retries=HTTP_RETRIES):
+    """
+    Run func() within the limits of the API named key. An exception for
+    which is_retryable(exc) is true is retried with backoff; others propagate.
+    """
+    api = limiter(key)
+    for attempt in range(retries + 1):
+        try:
+            with api.slot():
+                return func()
+        except Exception as e:
+            if attempt == retries or not is_retryable(e):
+                raise
+            delay = backoff_delay(attempt)
+            print(f"{key} call failed ({e}), retrying in {delay:.1f}s", file=sys.stderr)
+            time.sleep(delay)
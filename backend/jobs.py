@@ -0,0 +1,185 @@
+import asyncio
+import sys
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Jobs that are still queued or running are never pruned; finished ones are
+# kept around (for status polling) up to this many
+MAX_FINISHED_JOBS = 200
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's worker when the job has been cancelled."""
+
+
+def _duration(entry):
+    if entry["started_at"] and entry["finished_at"]:
+        return (entry["finished_at"] - entry["started_at"]).total_seconds()
+    return None
+
+
+class Job:
+    def __init__(self, owner, **meta):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.meta = meta
+        self.status = PENDING
+        self.stages = {}
+        self.error = None
+        self.result = None
+        self.created_at = datetime.utcnow()
+        self.finished_at = None
+        self.events = []
+        self._cancel_event = threading.Event()
+        self._events_lock = threading.Lock()
+        self._listeners = set()
+        self._loop = None
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise JobCancelled(f"Job {self.id} was cancelled")
+
+    def report(self, stage, status):
+        """Progress callback handed to the worker: records a stage transition
+        and doubles as a cancellation point."""
+        self.check_cancelled()
+        now = datetime.utcnow()
+        entry = self.stages.setdefault(stage, {"status": PENDING, "started_at": None, "finished_at": None})
+        entry["status"] = status
+        if status == RUNNING:
+            # repeated "running" reports from a long stage are just cancellation points
+            entry["started_at"] = entry["started_at"] or now
+        else:
+            entry["finished_at"] = now
+        self.publish("stage", {"name": stage, "status": status})
+
+    def publish(self, kind, data=None):
+        """Append an event for stream listeners; safe to call from worker threads."""
+        with self._events_lock:
+            self.events.append({"id": len(self.events), "event": kind, "data": data})
+        if self._loop is not None:
+            for waiter in list(self._listeners):
+                self._loop.call_soon_threadsafe(waiter.set)
+
+    async def stream(self, start=0):
+        """Yield the job's events from index start onwards until the job has finished."""
+        waiter = asyncio.Event()
+        self._listeners.add(waiter)
+        try:
+            index = start
+            while True:
+                waiter.clear()
+                finished = self.status in FINISHED_STATES
+                while index < len(self.events):
+                    yield self.events[index]
+                    index += 1
+                # every event is published before the status flips, so a finished job is fully drained here
+                if finished:
+                    return
+                await waiter.wait()
+        finally:
+            self._listeners.discard(waiter)
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "stages": [{"name": name, **entry, "duration": _duration(entry)} for name, entry in self.stages.items()],
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            **self.meta,
+        }
+
+
+class JobManager:
+    """Runs blocking work on a private thread pool so it never holds the event loop."""
+
+    def __init__(self, max_workers=2):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._tasks = set()
+        self._lock = threading.Lock()
+
+    def submit(self, owner, func, on_success=None, **meta):
+        """
+        Schedule func(job) on the worker pool and return the Job immediately.
+        on_success is an optional coroutine function awaited on the event loop
+        with the worker's return value.
+        """
+        job = Job(owner, **meta)
+        job._loop = asyncio.get_running_loop()
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+
+        task = asyncio.get_running_loop().create_task(self._run(job, func, on_success))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Request cancellation; the worker stops at its next progress report."""
+        job = self._jobs.get(job_id)
+        if job is None or job.status in FINISHED_STATES:
+            return job
+        job._cancel_event.set()
+        if job.status == PENDING:
+            self._finish(job, CANCELLED)
+        return job
+
+    async def _run(self, job, func, on_success):
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(self._executor, self._call, job, func)
+            job.check_cancelled()
+            if on_success is not None:
+                await on_success(result)
+            job.result = result
+            self._finish(job, SUCCEEDED)
+        except JobCancelled:
+            self._finish(job, CANCELLED)
+        except Exception as e:
+            print(f"Job {job.id} failed: {e}", file=sys.stderr)
+            job.error = str(e)
+            self._finish(job, FAILED)
+
+    def _call(self, job, func):
+        job.check_cancelled()
+        job.status = RUNNING
+        return func(job)
+
+    def _finish(self, job, status):
+        if job.status in FINISHED_STATES:
+            return
+        job.publish("job", {"status": status, "error": job.error})
+        job.status = status
+        job.finished_at = datetime.utcnow()
+        for entry in job.stages.values():
+            if entry["status"] == RUNNING:
+                entry["status"] = status
+
+    def _prune(self):
+        finished = [job for job in self._jobs.values() if job.status in FINISHED_STATES]
+        if len(finished) <= MAX_FINISHED_JOBS:
+            return
+        finished.sort(key=lambda job: job.finished_at)
+        for job in finished[:len(finished) - MAX_FINISHED_JOBS]:
+            del self._jobs[job.id]
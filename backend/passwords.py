@@ -0,0 +1,84 @@
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+
+from passlib.context import CryptContext
+
+
+@lru_cache(maxsize=None)
+def _context(schemes):
+    return CryptContext(schemes=list(schemes), deprecated="auto")
+
+
+# module level so a process pool can pickle them; each worker builds its context once
+def _hash(schemes, password):
+    return _context(schemes).hash(password)
+
+
+def _verify(schemes, plain, hashed):
+    return _context(schemes).verify(plain, hashed)
+
+
+class PasswordPool:
+    """
+    Runs password hashing and verification on a dedicated pool, so a burst
+    of logins queues there instead of blocking the event loop. bcrypt
+    releases the GIL, so threads scale with cores; kind="process" isolates
+    the work completely at the cost of a pickle per call. Counters are only
+    touched on the event loop; stats() reports the queue depth and how long
+    calls wait and run.
+    """
+
+    def __init__(self, schemes=("bcrypt",), workers=4, kind="thread"):
+        self.schemes = tuple(schemes)
+        self.workers = workers
+        self.kind = kind
+        executor = ProcessPoolExecutor if kind == "process" else ThreadPoolExecutor
+        self._executor = executor(max_workers=workers)
+        # calls wait here rather than inside the executor, so the queue can be measured
+        self._slots = asyncio.Semaphore(workers)
+        self.queued = 0
+        self.running = 0
+        self.max_queued = 0
+        self.completed = 0
+        self.wait_seconds = 0.0
+        self.run_seconds = 0.0
+
+    async def _submit(self, func, *args):
+        submitted = time.perf_counter()
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+        started = time.perf_counter()
+        self.running += 1
+        try:
+            return await asyncio.wrap_future(self._executor.submit(func, *args))
+        finally:
+            self.running -= 1
+            self._slots.release()
+            self.completed += 1
+            self.wait_seconds += started - submitted
+            self.run_seconds += time.perf_counter() - started
+
+    async def hash(self, password):
+        return await self._submit(_hash, self.schemes, password)
+
+    async def verify(self, plain, hashed):
+        return await self._submit(_verify, self.schemes, plain, hashed)
+
+    def stats(self):
+        completed = self.completed or 1
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "queued": self.queued,
+            "running": self.running,
+            "max_queued": self.max_queued,
+            "completed": self.completed,
+            "avg_wait_ms": round(self.wait_seconds / completed * 1000, 2),
+            "avg_run_ms": round(self.run_seconds / completed * 1000, 2),
+        }
@@ -0,0 +1,102 @@
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class Stage:
+    """
+    One step of a pipeline. func is called with its declared inputs as keyword
+    arguments and returns its single output, or a tuple when it declares several.
+    """
+
+    def __init__(self, name, func, inputs=(), outputs=None):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs) if outputs else (name,)
+
+    def store(self, result, values):
+        if len(self.outputs) == 1:
+            values[self.outputs[0]] = result
+        else:
+            values.update(zip(self.outputs, result))
+
+
+class Pipeline:
+    """
+    Runs stages as soon as all of their inputs exist, so independent stages
+    overlap on a thread pool and only the critical path is serial.
+    """
+
+    def __init__(self, stages, max_workers=4):
+        self.stages = list(stages)
+        self.max_workers = max_workers
+
+        produced = set()
+        for stage in self.stages:
+            duplicate = produced.intersection(stage.outputs)
+            if duplicate:
+                raise ValueError(f"Outputs {sorted(duplicate)} are produced by more than one stage")
+            produced.update(stage.outputs)
+
+    def downstream(self, changed):
+        """Names of every value that depends, directly or transitively, on the changed inputs."""
+        dirty = set(changed)
+        grew = True
+        while grew:
+            grew = False
+            for stage in self.stages:
+                if dirty.intersection(stage.inputs) and not dirty.issuperset(stage.outputs):
+                    dirty.update(stage.outputs)
+                    grew = True
+        return dirty - set(changed)
+
+    def run(self, initial, report=None, on_output=None):
+        """
+        Execute every stage. initial holds the values no stage produces, plus
+        any stage outputs to reuse: a stage whose outputs are all given is skipped.
+        report(stage, status) is called with "running" and "done" (or "skipped") per stage.
+        on_output(name, value) is called for every value as soon as its stage finishes.
+        Returns (values, timings) where timings maps stage name to seconds.
+        """
+        values = dict(initial)
+        timings = {}
+        pending = []
+        running = {}
+        for stage in self.stages:
+            if all(name in values for name in stage.outputs):
+                if report is not None:
+                    report(stage.name, "skipped")
+            else:
+                pending.append(stage)
+
+        pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stage")
+        try:
+            while pending or running:
+                ready = [stage for stage in pending if all(name in values for name in stage.inputs)]
+                for stage in ready:
+                    pending.remove(stage)
+                    if report is not None:
+                        report(stage.name, "running")
+                    kwargs = {name: values[name] for name in stage.inputs}
+                    running[pool.submit(stage.func, **kwargs)] = (stage, time.perf_counter())
+
+                if not running:
+                    missing = sorted({name for stage in pending for name in stage.inputs if name not in values})
+                    raise ValueError(f"Stages {[stage.name for stage in pending]} wait on inputs nothing produces: {missing}")
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, started = running.pop(future)
+                    stage.store(future.result(), values)
+                    if on_output is not None:
+                        for name in stage.outputs:
+                            on_output(name, values[name])
+                    timings[stage.name] = time.perf_counter() - started
+                    print(f"Stage {stage.name} took {timings[stage.name]:.2f}s", file=sys.stderr)
+                    if report is not None:
+                        report(stage.name, "done")
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+        return values, timings
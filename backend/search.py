@@ -0,0 +1,161 @@
+import html
+import re
+from bisect import bisect_right
+
+from align import STOPWORDS, WORD_RE, stem, terms
+from vtt import parse_timestamp
+
+# lecture fields worth searching; their text lives in the blob store, so each
+# lecture keeps the distinct words of every field under search_text for the index
+SEARCH_FIELDS = ("userNotes", "ai_note", "transcript")
+
+# text index over the lecture fields worth searching; names and the user's own notes rank highest
+LECTURE_TEXT_INDEX = [
+    ("lecture_name", "text"),
+    ("search_text.userNotes", "text"),
+    ("search_text.ai_note", "text"),
+    ("search_text.transcript", "text"),
+]
+LECTURE_TEXT_WEIGHTS = {
+    "lecture_name": 10,
+    "search_text.userNotes": 5,
+    "search_text.ai_note": 3,
+    "search_text.transcript": 1,
+}
+
+# fields a snippet is taken from, most useful first
+SNIPPET_FIELDS = ("ai_note", "userNotes", "transcript")
+SNIPPET_WIDTH = 160
+
+TAG_RE = re.compile(r"<[^>]+>")
+STAMP_RE = re.compile(r"\[(\d{1,2}:\d{2}:\d{2})\]")
+INDEX_WORD_RE = re.compile(r"\w+")
+
+
+def index_terms(text):
+    """Distinct words of text, tags removed, in first-seen order; a fraction of the size of the text."""
+    words = INDEX_WORD_RE.findall(TAG_RE.sub(" ", text or "").lower())
+    return " ".join(dict.fromkeys(words))
+
+
+def term_pattern(query):
+    """Regex matching any word that starts with one of the query's stemmed terms."""
+    stems = sorted(set(terms(query)), key=len, reverse=True)
+    if not stems:
+        return None
+    return re.compile(r"\b(" + "|".join(re.escape(stem) for stem in stems) + r")\w*", re.IGNORECASE)
+
+
+def snippet(text, pattern, width=SNIPPET_WIDTH):
+    """
+    Escaped HTML excerpt around the first match of pattern in text, with every
+    match wrapped in <mark>. Returns (snippet, match_position) or (None, None).
+    """
+    match = pattern.search(text)
+    if not match:
+        return None, None
+    start = max(0, match.start() - width // 3)
+    end = min(len(text), start + width)
+    excerpt = text[start:end]
+    parts = []
+    last = 0
+    for hit in pattern.finditer(excerpt):
+        parts.append(html.escape(excerpt[last:hit.start()]))
+        parts.append(f"<mark>{html.escape(hit.group(0))}</mark>")
+        last = hit.end()
+    parts.append(html.escape(excerpt[last:]))
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if end < len(text) else ""
+    return prefix + "".join(parts).strip() + suffix, match.start()
+
+
+def _first_stems(text):
+    """Position of the first occurrence of each searchable stem in text."""
+    first = {}
+    for match in WORD_RE.finditer(text.lower()):
+        word = match.group(0)
+        if word not in STOPWORDS and len(word) > 1:
+            first.setdefault(stem(word), match.start())
+    return first
+
+
+def _context(text, position, width=SNIPPET_WIDTH):
+    start = max(0, position - width // 3)
+    end = min(len(text), start + width)
+    return ("…" if start > 0 else "") + text[start:end] + ("…" if end < len(text) else "")
+
+
+def term_entries(field, text, cues=None):
+    """
+    One search entry per distinct stem of a lecture field, for its first
+    occurrence: {"field", "stem", "position", "context", "seconds"}. context is
+    just enough text around it for a snippet. seconds is the [hh:mm:ss] stamp
+    before it in the AI notes, or the start of the cue it is spoken in when the
+    transcript's cues (a CueIndex) are given. Built when a lecture is saved, so
+    a search never reads the materials themselves.
+    """
+    entries = []
+    if field == "transcript" and cues is not None and len(cues):
+        texts = [cues.text[cues.text_offsets[i]:cues.text_offsets[i + 1]] for i in range(len(cues))]
+        seen = set()
+        for cue, cue_text in enumerate(texts):
+            new = [term for term in _first_stems(cue_text) if term not in seen]
+            if not new:
+                continue
+            seen.update(new)
+            # the cue and the ones after it, so a short cue still gives a readable snippet;
+            # cue texts are stored back to back, so they are joined as text_between does
+            context = _context(" ".join(texts[cue:cue + 3]), 0)
+            entries.extend(
+                {"field": field, "stem": term, "position": cue, "context": context, "seconds": cues.starts[cue]}
+                for term in new
+            )
+        return entries
+
+    plain = (text or "") if field == "transcript" else " ".join(TAG_RE.sub(" ", text or "").split())
+    stamps = [(match.start(), parse_timestamp(match.group(1))) for match in STAMP_RE.finditer(plain)]
+    stamp_positions = [position for position, _ in stamps]
+    # the digits of [hh:mm:ss] stamps are not words; blanked out so positions still line up
+    words = STAMP_RE.sub(lambda match: " " * len(match.group(0)), plain)
+    for term, position in _first_stems(words).items():
+        seconds = None
+        if field == "ai_note":
+            before = bisect_right(stamp_positions, position) - 1
+            seconds = stamps[before][1] if before >= 0 else None
+        entries.append({
+            "field": field, "stem": term, "position": position,
+            "context": _context(plain, position), "seconds": seconds,
+        })
+    return entries
+
+
+def lecture_hit(lecture, entries, pattern):
+    """
+    Snippet for one lecture found by the text index, as {"field", "snippet",
+    "seconds"}, from the lecture's term entries matching the query. The entry
+    whose context matches the most query terms wins, earliest first. seconds
+    comes from the AI notes' stamps when the snippet does, otherwise from the
+    transcript cue matching the query best.
+    """
+    by_field = {}
+    for entry in entries:
+        by_field.setdefault(entry["field"], []).append(entry)
+
+    def best(field):
+        return max(
+            by_field.get(field, ()),
+            key=lambda entry: (len({hit.group(1).lower() for hit in pattern.finditer(entry["context"])}), -entry["position"]),
+            default=None,
+        )
+
+    cue = best("transcript")
+    cue_seconds = cue["seconds"] if cue else None
+    for field in SNIPPET_FIELDS:
+        entry = best(field)
+        found = snippet(entry["context"], pattern)[0] if entry else None
+        if found:
+            seconds = entry["seconds"] if field == "ai_note" else None
+            return {"field": field, "snippet": found, "seconds": seconds if seconds is not None else cue_seconds}
+
+    found, _ = snippet(lecture.get("lecture_name", ""), pattern)
+    return {"field": "lecture_name", "snippet": found or html.escape(lecture.get("lecture_name", "")), "seconds": cue_seconds}
@@ -0,0 +1,112 @@
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+
+from align import Aligner
+from extraction import extract, pdf_pages
+from llm_cache import CACHE_DIR
+from vtt import format_timestamp
+
+DEFAULT_SLIDE_CACHE_PATH = os.path.join(CACHE_DIR, "slides.sqlite3")
+
+# a slide deck that takes longer than this to parse is given up on
+SLIDE_EXTRACT_TIMEOUT = float(os.getenv('SLIDE_EXTRACT_TIMEOUT', '120'))
+
+
+class SlideTextCache:
+    """Per-page text of slide PDFs, keyed by the sha256 of the file, so each deck is parsed once."""
+
+    def __init__(self, path=DEFAULT_SLIDE_CACHE_PATH):
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS slide_decks (digest TEXT PRIMARY KEY, pages INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS slide_pages ("
+            " digest TEXT NOT NULL, page INTEGER NOT NULL, text TEXT NOT NULL,"
+            " PRIMARY KEY (digest, page))"
+        )
+        self._conn.commit()
+
+    def get(self, digest):
+        """Page texts in order, or None if the deck has not been parsed."""
+        with self._lock:
+            deck = self._conn.execute("SELECT pages FROM slide_decks WHERE digest = ?", (digest,)).fetchone()
+            if deck is None:
+                return None
+            rows = self._conn.execute(
+                "SELECT text FROM slide_pages WHERE digest = ? ORDER BY page", (digest,)
+            ).fetchall()
+        return [row[0] for row in rows] if len(rows) == deck[0] else None
+
+    def put(self, digest, pages):
+        with self._lock:
+            self._conn.execute("DELETE FROM slide_pages WHERE digest = ?", (digest,))
+            self._conn.executemany(
+                "INSERT INTO slide_pages (digest, page, text) VALUES (?, ?, ?)",
+                [(digest, page, text) for page, text in enumerate(pages)],
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO slide_decks (digest, pages) VALUES (?, ?)", (digest, len(pages))
+            )
+            self._conn.commit()
+
+
+slide_cache = SlideTextCache(os.getenv('SLIDE_CACHE_PATH', DEFAULT_SLIDE_CACHE_PATH))
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def slide_pages(path):
+    """Per-page text of a slide PDF, parsed in the extraction pool the first time its content is seen."""
+    digest = file_digest(path)
+    pages = slide_cache.get(digest)
+    if pages is None:
+        pages = extract(pdf_pages, path, timeout=SLIDE_EXTRACT_TIMEOUT)
+        slide_cache.put(digest, pages)
+        print(f"Extracted {len(pages)} slide pages from {os.path.basename(path)}", file=sys.stderr)
+    return pages
+
+
+def labelled_slide_text(pages):
+    """Slide pages as one labelled text for a prompt; empty when the deck has no text."""
+    return "\n".join(f"Slide {page}: {text}" for page, text in enumerate(pages, 1) if text)
+
+
+def map_slides(pages, index):
+    """
+    Transcript time range of each slide page as {"page", "start", "end",
+    "timestamp"}. Pages are matched against the cues in deck order; a page
+    with no match (a title slide, a diagram) starts where the previous one
+    did. Each page runs until the next page starts, the last one until the
+    end of the transcript.
+    """
+    aligner = Aligner(index)
+    position = 0
+    starts = []
+    for text in pages:
+        cue = aligner.locate(text, after=position)
+        if cue is not None:
+            position = cue
+        starts.append(index.starts[position] if len(index) else 0.0)
+
+    slides = []
+    for page, start in enumerate(starts):
+        end = starts[page + 1] if page + 1 < len(starts) else index.duration
+        slides.append({
+            "page": page + 1,
+            "start": start,
+            "end": max(start, end),
+            "timestamp": format_timestamp(start),
+        })
+    return slides
@@ -1,12 +1,57 @@
 from google import genai
+from google.genai import types, errors
 from dotenv import load_dotenv
-from webscraper import search_web, google_image_search
+from webscraper import search_web, search_images
+from pipeline import Pipeline, Stage
+from llm_cache import ResponseCache, DEFAULT_CACHE_PATH
+from file_registry import UploadRegistry, DEFAULT_REGISTRY_PATH
+from workspace import Workspace
+from vtt import CueIndex
+from align import align_outline
+from chunking import chunk_sources, reduce_hierarchically
+from http_client import RETRY_STATUSES, call_with_backoff
+from slides import slide_pages, labelled_slide_text
+from concurrent.futures import ThreadPoolExecutor
 import os
 import sys
+import time
+import hashlib
+import threading
+import mimetypes
+import io
 load_dotenv()
 
 API_KEY = os.getenv('GEMINI_API_KEY')
 NUM_RESULTS = 3
+# bounds for the web research fan-out: headings researched at once, and chunk
+# summaries in flight per heading
+HEADING_CONCURRENCY = int(os.getenv('HEADING_CONCURRENCY', '5'))
+CHUNK_CONCURRENCY = int(os.getenv('CHUNK_CONCURRENCY', '4'))
+# token budgets for the web research map-reduce: scraped text per chunk summary,
+# and partial summaries per combine request
+MAP_TOKEN_BUDGET = int(os.getenv('MAP_TOKEN_BUDGET', '100000'))
+REDUCE_TOKEN_BUDGET = int(os.getenv('REDUCE_TOKEN_BUDGET', '100000'))
+# how many pipeline stages may run at the same time
+STAGE_CONCURRENCY = int(os.getenv('STAGE_CONCURRENCY', '4'))
+# intermediates stay in memory per run; set this to also keep a copy of each run's files on disk
+WORKSPACE_SPILL_DIR = os.getenv('NOTES_WORKSPACE_DIR') or None
+# responses are reused across runs when the model, prompt and attached files are unchanged
+GEMINI_CACHE_ENABLED = os.getenv('GEMINI_CACHE_DISABLED', '') != '1'
+response_cache = ResponseCache(
+    os.getenv('GEMINI_CACHE_PATH', DEFAULT_CACHE_PATH),
+    max_bytes=int(os.getenv('GEMINI_CACHE_MAX_MB', '256')) * 1024 * 1024,
+)
+# remote files are reused by content hash until shortly before Gemini expires them
+upload_registry = UploadRegistry(os.getenv('GEMINI_UPLOAD_REGISTRY_PATH', DEFAULT_REGISTRY_PATH))
+
+# stage outputs that are plain text or lists, so they can be stored with a lecture and reused
+REUSABLE_VALUES = (
+    "initial_outline", "timestamped_outline", "templated_user_notes", "timestamped_notes_text",
+    "key_headings", "key_subheadings", "web_notes", "subheading_image_pairs", "final_notes",
+)
+
+# finished stage outputs worth showing to a reader while the rest of the run is still going
+STREAMED_VALUES = ("initial_outline", "timestamped_outline", "templated_user_notes", "timestamped_notes_text", "final_notes")
 
 def remove_first_and_last_lines(text):
     lines = text.splitlines()
@@ -17,10 +62,121 @@ def remove_first_and_last_lines(text):
     else:
         return ''
 
-def generate_notes(user_notes_path, text_file_path, vtt_file_path):
+class Attachment:
+    """
+    File contents handed to Gemini; they are hashed up front and only uploaded
+    when a call needs them, and not at all if the same content is already uploaded.
+    """
+
+    def __init__(self, client, data, mime_type, name):
+        self.client = client
+        self.data = data
+        self.mime_type = mime_type
+        self.name = name
+        self.digest = hashlib.sha256(data).hexdigest()
+        self.reused = False
+        self._uploaded = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_path(cls, client, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        mime_type = mimetypes.guess_type(path)[0] or 'text/plain'
+        return cls(client, data, mime_type, os.path.basename(path))
+
+    def upload(self):
+        with self._lock:
+            if self._uploaded is None:
+                remote = upload_registry.get(self.digest)
+                if remote:
+                    self._uploaded = types.Part.from_uri(file_uri=remote['uri'], mime_type=remote['mime_type'])
+                    self.reused = True
+                else:
+                    self._uploaded = self.client.files.upload(
+                        file=io.BytesIO(self.data),
+                        config=types.UploadFileConfig(mime_type=self.mime_type, display_name=self.name),
+                    )
+                    upload_registry.put(self.digest, self._uploaded)
+            return self._uploaded
+
+    def invalidate(self):
+        # the registry pointed at a remote file Gemini no longer has
+        with self._lock:
+            upload_registry.forget(self.digest)
+            self._uploaded = None
+            self.reused = False
+
+def generate(client, model, contents, use_cache=True):
+    # contents are prompt strings and Attachments; returns the response text.
+    # use_cache=False skips the lookup but still refreshes the stored response.
+    key = ResponseCache.make_key(model, ["file:" + part.digest if isinstance(part, Attachment) else part for part in contents])
+    if use_cache and GEMINI_CACHE_ENABLED:
+        text = response_cache.get(key)
+        if text is not None:
+            return text
+
+    def attempt():
+        return client.models.generate_content(
+            model=model, contents=[part.upload() if isinstance(part, Attachment) else part for part in contents]
+        )
+
+    def call():
+        # every thread of every run shares the Gemini concurrency cap and rate limit
+        return call_with_backoff("gemini", attempt, is_rate_limited)
+
+    try:
+        response = call()
+    except errors.ClientError as e:
+        reused = [part for part in contents if isinstance(part, Attachment) and part.reused]
+        # only a missing or inaccessible file means a remembered upload was deleted early;
+        # quota and request errors are not fixed by uploading again
+        if not reused or e.code not in (403, 404):
+            raise
+        # upload it again and retry once
+        for part in reused:
+            part.invalidate()
+        response = call()
+    if response.text is not None and GEMINI_CACHE_ENABLED:
+        response_cache.put(key, response.text)
+    return response.text
+
+def is_rate_limited(e):
+    # quota and overload answers are worth retrying; other API errors are not
+    return isinstance(e, errors.APIError) and e.code in RETRY_STATUSES
+
+def _map_concurrently(func, items, max_workers):
+    # like map(), but on up to max_workers threads; results keep the input order
+    if not items:
+        return []
+    pool = ThreadPoolExecutor(max_workers=min(max_workers, len(items)))
+    try:
+        return list(pool.map(func, items))
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def _report(report, stage, status):
+    # report(stage, status) is the optional progress callback; it may raise to cancel the run
+    if report is not None:
+        report(stage, status)
+
+def run_note_pipeline(user_notes_path, text_file_path, vtt_file_path, report=None, use_cache=True, previous=None, changed=None, workspace=None, publish=None, slides_path=""):
+    """
+    Generate AI notes. previous holds the REUSABLE_VALUES of an earlier run for
+    the same lecture and changed lists the inputs (user_notes_path,
+    text_file_path, vtt_file_path, slides_path) whose content differs since
+    then; only the stages downstream of a changed input run again.
+    slides_path is an optional slide PDF whose text informs the outline.
+    Intermediates go to workspace (a fresh Workspace by default).
+    publish(kind, data) receives each STREAMED_VALUES output and every
+    "web_section" as soon as it is ready.
+    Returns (final_notes, reusable_values).
+    """
     client = genai.Client(api_key=API_KEY)
+    workspace = workspace or Workspace(WORKSPACE_SPILL_DIR)
 
-    raw_transcript = client.files.upload(file=text_file_path)
+    def ask(model, contents):
+        return generate(client, model, contents, use_cache)
 
     raw_outline_template = """
     <h1>1. SUBJECT MAIN HEADING<h1>   
@@ -39,75 +195,6 @@ def generate_notes(user_notes_path, text_file_path, vtt_file_path):
         <h2>SUBJECT SUBHEADING N</h2> 
     """
     
-    timestamped_outline_template = """
-    <h1>[hh:mm:ss] 1. SUBJECT MAIN HEADING<h1>   
-        <h2>[hh:mm:ss] SUBJECT SUBHEADING 1</h2>
-        <h2>[hh:mm:ss] SUBJECT SUBHEADING 2</h2>
-        <h2>[hh:mm:ss] SUBJECT SUBHEADING N</h2>
-
-    <h1>[hh:mm:ss] 2. SUBJECT MAIN HEADING<h1>   
-        <h2>[hh:mm:ss] SUBJECT SUBHEADING 1</h2>
-        <h2>[hh:mm:ss] SUBJECT SUBHEADING 2</h2>
-        <h2>[hh:mm:ss] SUBJECT SUBHEADING N</h2>
-    
-    <h1>[hh:mm:ss] N. SUBJECT MAIN HEADING<h1>   
-        <h2>[hh:mm:ss] SUBJECT SUBHEADING 1</h2>
-        <h2>[hh:mm:ss] SUBJECT SUBHEADING 2</h2>
-        <h2>[hh:mm:ss] SUBJECT SUBHEADING N</h2>
-    """
-    
-    initial_outline = client.models.generate_content(
-        model="gemini-2.5-flash-preview-04-17", contents=["You are student taking notes for a lecture. Can you summarize this lecture transcript by key topics? Limit it to 5 h1 headers and follow this format EXACTLY: \n" + raw_outline_template, raw_transcript]
-    )
-    
-    print("Finished initial outline!", file=sys.stderr)
-
-    with open('./text_files/outline.txt', 'w') as output:
-        output.write(initial_outline.text)
-
-    timestamped_transcript = client.files.upload(file=vtt_file_path)
-
-    timestamped_outline = client.models.generate_content(
-        model="gemini-2.0-flash", contents=["You are a transcriber that is trying to timestamp lecture notes. Can you timestamp each key topic from the initial outline file using the vtt file. Follow this format and keep the html tags: \n" 
-                                            + timestamped_outline_template, 
-                                            initial_outline, timestamped_transcript]
-    )
-
-    print("Finished timestamped outline!", file=sys.stderr)
-
-    with open('./text_files/time_stamped_outline.txt', 'w') as output:
-        output.write(timestamped_outline.text)
-
-    user_notes = client.files.upload(file=user_notes_path)
-
-    user_note_prompt = f"""
-        You are a student organizing lecture notes.
-
-        TASK:
-        - Use the given outline headings (h1) and subheadings (h2) to organize the user notes.
-        - Keep all the original content from the user notes.
-        - For each h1 and h2 heading from the outline, place the related user notes underneath as bullet points.
-        - Keep all timestamps [hh:mm:ss] at the start of each bullet point.
-        Here is the given outline:
-        
-        {timestamped_outline.text}
-
-        Input:
-        - Full detailed user notes with timestamps.
-        Your goal is to smartly merge them together while preserving everything the outline template.
-    """
-    
-    user_notes_outline_response = client.models.generate_content(
-        model="gemini-2.0-flash", contents=[user_note_prompt, timestamped_outline, user_notes]
-    )
-    
-    with open('./text_files/templated_user_notes.txt', 'w') as output:
-        output.write(user_notes_outline_response.text)    
-
-    print("Finished formatting user notes!", file=sys.stderr)
-
-    formatted_user_notes = client.files.upload(file='./text_files/templated_user_notes.txt')
-    
     timestamped_notes_prompt = """
     You are a student writing extremely detailed lecture notes.
 
@@ -187,18 +274,6 @@ def generate_notes(user_notes_path, text_file_path, vtt_file_path):
     Your goal is to add additional detailed notes intelligently into the existing structure.
     """
 
-    timestamped_notes = client.models.generate_content(
-        model="gemini-2.0-flash", contents=[timestamped_notes_prompt, formatted_user_notes, timestamped_transcript]
-    )
-
-    print("Finished timestamped notes!", file=sys.stderr)
-
-    with open('./text_files/time_stamped_notes.txt', 'w') as output:
-        output.write(timestamped_notes.text)
-    
-    def chunk_combined_text(text, max_chars=500000):  # 1 token ≈ 3-4 chars usually
-        return [text[i:i+max_chars] for i in range(0, len(text), max_chars)]
-
     key_heading_template = """
         <h1>1. SUBJECT MAIN HEADING</h1>   
         <h1>2. SUBJECT MAIN HEADING</h1>   
@@ -212,73 +287,204 @@ def generate_notes(user_notes_path, text_file_path, vtt_file_path):
         <h2>SUBJECT SUBHEADING N</h2>
     """
 
-    timestamped_notes = client.files.upload(file="./text_files/time_stamped_notes.txt")
+    # every stage declares the values it reads and writes; the pipeline starts a
+    # stage as soon as its inputs exist, so independent stages overlap.
+    # Files are wrapped as Attachments and only uploaded on a cache miss.
+    def upload_transcript(text_file_path):
+        return Attachment.from_path(client, text_file_path)
+
+    def upload_vtt(vtt_file_path):
+        return Attachment.from_path(client, vtt_file_path)
+
+    def upload_user_notes(user_notes_path):
+        return Attachment.from_path(client, user_notes_path)
+
+    def extract_slide_text(slides_path):
+        # parsed once per deck in the extraction pool; usually already cached from the upload
+        if not slides_path:
+            return ""
+        try:
+            return labelled_slide_text(slide_pages(slides_path))
+        except Exception as e:
+            print(f"Could not read slides {slides_path}: {e}", file=sys.stderr)
+            return ""
+
+    def outline(raw_transcript, slide_text):
+        contents = ["You are student taking notes for a lecture. Can you summarize this lecture transcript by key topics? Limit it to 5 h1 headers and follow this format EXACTLY: \n" + raw_outline_template, raw_transcript]
+        if slide_text:
+            contents.append("The lecture slides, page by page, for the topic names and their order:\n" + slide_text)
+        initial_outline = ask("gemini-2.5-flash-preview-04-17", contents)
+        
+        print("Finished initial outline!", file=sys.stderr)
 
-    key_headings_response = client.models.generate_content(
-        model="gemini-2.0-flash", contents=["You are student trying to review key topics from lecture. Can you extract only the SUBJECT MAIN HEADING without any addtional characters or numbers from this format: \n:" 
-                                            + key_heading_template + " Filter out anything non-academic like course logistics, administration or overview.",
-                                            timestamped_notes]
-    )
+        workspace.write('outline.txt', initial_outline)
+        return initial_outline
 
-    key_subheadings_response = client.models.generate_content(
-        model="gemini-2.0-flash", contents=["You are student trying to review key topics from lecture. Can you extract only the SUBJECT SUBHEADING without any addtional characters or numbers from this format: \n:" 
-                                            + key_subheading_template + " Filter out anything non-academic like course logistics, administration or overview.",
-                                            timestamped_notes]
-    )
+    def timestamp_outline(initial_outline, vtt_file_path):
+        # matched locally against the vtt cues, so no model call is needed for the timestamps
+        timestamped_outline = align_outline(initial_outline, CueIndex.from_file(vtt_file_path))
 
-    print("Finished key topic extraction!", file=sys.stderr)
+        print("Finished timestamped outline!", file=sys.stderr)
 
-    with open('./text_files/key_headings.txt', 'w') as output:
-        output.write(key_headings_response.text)   
+        workspace.write('time_stamped_outline.txt', timestamped_outline)
+        return timestamped_outline
 
-    with open('./text_files/key_subheadings.txt', 'w') as output:
-        output.write(key_subheadings_response.text)   
+    def organize_user_notes(timestamped_outline, user_notes):
+        user_note_prompt = f"""
+            You are a student organizing lecture notes.
 
-    key_headings = key_headings_response.text.split('\n')
-    key_subheadings = key_subheadings_response.text.split('\n')
-    # print(key_subheadings)
+            TASK:
+            - Use the given outline headings (h1) and subheadings (h2) to organize the user notes.
+            - Keep all the original content from the user notes.
+            - For each h1 and h2 heading from the outline, place the related user notes underneath as bullet points.
+            - Keep all timestamps [hh:mm:ss] at the start of each bullet point.
+            Here is the given outline:
+            
+            {timestamped_outline}
 
-    # searches the web for relevant websites to add info
-    for i, term in enumerate(key_headings):
-        # skips empty newlines which sometimes happens
-        if not term:
-            continue
-        
-        search_result = search_web(term, NUM_RESULTS)
-        combined_text_data = ""
-        for result in search_result:
-            print("SCANNING URL: ", result['url'], file=sys.stderr)
-            combined_text_data += result['url'] + ": " + result['text'] + "\n"
-
-        # chunk the input file to prevent sending too many tokens
-        chunks = chunk_combined_text(combined_text_data)
-        summaries = []
-        # print(combined_text_data)
+            Input:
+            - Full detailed user notes with timestamps.
+            Your goal is to smartly merge them together while preserving everything the outline template.
+        """
         
+        user_notes_outline_response = ask(
+            "gemini-2.0-flash", [user_note_prompt, timestamped_outline, user_notes]
+        )
+
+        print("Finished formatting user notes!", file=sys.stderr)
+        return user_notes_outline_response
+
+    # text outputs may come from an earlier run, so they are written to this run's workspace before attaching
+    def attach_user_notes_outline(templated_user_notes):
+        data = workspace.write('templated_user_notes.txt', templated_user_notes)
+        return Attachment(client, data, 'text/plain', 'templated_user_notes.txt')
+
+    def expand_notes(formatted_user_notes, timestamped_transcript):
+        timestamped_notes = ask(
+            "gemini-2.0-flash", [timestamped_notes_prompt, formatted_user_notes, timestamped_transcript]
+        )
+
+        print("Finished timestamped notes!", file=sys.stderr)
+        return timestamped_notes
+
+    def attach_timestamped_notes(timestamped_notes_text):
+        data = workspace.write('time_stamped_notes.txt', timestamped_notes_text)
+        return Attachment(client, data, 'text/plain', 'time_stamped_notes.txt')
+
+    def extract_key_headings(timestamped_notes):
+        key_headings_response = ask(
+            "gemini-2.0-flash", ["You are student trying to review key topics from lecture. Can you extract only the SUBJECT MAIN HEADING without any addtional characters or numbers from this format: \n:" 
+                                                + key_heading_template + " Filter out anything non-academic like course logistics, administration or overview.",
+                                                timestamped_notes]
+        )
+
+        workspace.write('key_headings.txt', key_headings_response)
+        print("Finished key heading extraction!", file=sys.stderr)
+        return key_headings_response.split('\n')
 
-        for idx, chunk in enumerate(chunks):
+    def extract_key_subheadings(timestamped_notes):
+        key_subheadings_response = ask(
+            "gemini-2.0-flash", ["You are student trying to review key topics from lecture. Can you extract only the SUBJECT SUBHEADING without any addtional characters or numbers from this format: \n:" 
+                                                + key_subheading_template + " Filter out anything non-academic like course logistics, administration or overview.",
+                                                timestamped_notes]
+        )
+
+        workspace.write('key_subheadings.txt', key_subheadings_response)
+        print("Finished key subheading extraction!", file=sys.stderr)
+        return key_subheadings_response.split('\n')
+
+    def research_headings(key_headings, timestamped_notes):
+        # searches the web for relevant websites to add info
+        def research_heading(args):
+            i, term = args
+            _report(report, "web_research", "running")
             
-            initial_prompt = f"""
+            search_result = search_web(term, NUM_RESULTS)
+            for result in search_result:
+                print("SCANNING URL: ", result['url'], file=sys.stderr)
+
+            # chunk by token budget, keeping each source whole where it fits
+            chunks = chunk_sources([(result['url'], result['text']) for result in search_result], MAP_TOKEN_BUDGET)
+
+            def summarize_chunk(args):
+                idx, chunk = args
+                initial_prompt = f"""
+                You are an academic smart study researcher.
+
+                Topic: '{term}'
+
+                TASK:
+                - Read through the grouped texts.
+                - For each important fact, add the source URL to the href.
+                - Prefer concise, clear notes.
+                - Ignore repeated, irrelevant, or off-topic content.
+                - Make sure to preserve the original notes. 
+                - If there are any new points in the grouped texts that are not already covered in the original notes, add them under the appropriate <h2> subheadings.
+                - Group related ideas under the current <h2> subheadings.
+                - Follow the output format EXACTLY.
+
+                Input format:
+                URL: Text
+
+                Output format:
+                    <h1>
+                        {idx + 1}. {term}
+                        <a href="URL">
+                            [Source 1]
+                        </a>
+                        <a href="URL">
+                            [Source 2]
+                        </a>
+                        <a href="URL">
+                            [Source N]
+                        </a>
+                    </h1>
+                    <h2>SUBJECT SUBHEADING 1</h2>
+                        <ul>
+                            <li>bullet 1</li>
+                            <li>bullet 2</li>
+                            <li>bullet N</li>
+                        </ul>
+                    <h2>SUBJECT SUBHEADING 2</h2>
+                        <ul>
+                            <li>bullet 1</li>
+                            <li>bullet 2</li>
+                            <li>bullet N</li>
+                        </ul>
+                    <h2>SUBJECT SUBHEADING N</h2>
+                        <ul>
+                            <li>bullet 1</li>
+                            <li>bullet 2</li>
+                            <li>bullet N</li>
+                        </ul>
+
+                Here is the data grouped by source: {chunk}
+                """
+
+                chunk_summary_response = ask(
+                    "gemini-2.0-flash", [initial_prompt]
+                )
+                return chunk_summary_response
+
+            summaries = _map_concurrently(summarize_chunk, list(enumerate(chunks)), CHUNK_CONCURRENCY)
+
+            def combine_prompt(combined_summary):
+                return f"""
             You are an academic smart study researcher.
 
-            Topic: '{term}'
-
             TASK:
-            - Read through the grouped texts.
-            - For each important fact, add the source URL to the href.
-            - Prefer concise, clear notes.
-            - Ignore repeated, irrelevant, or off-topic content.
-            - Make sure to preserve the original notes. 
-            - If there are any new points in the grouped texts that are not already covered in the original notes, add them under the appropriate <h2> subheadings.
+            - Combine the following multiple summarized notes into one clean, organized, and complete final set of notes.
+            - Make sure to preserve all the original points in the notes.
+            - If there are any new points in the website summaries that are not already covered in the original notes, add them under the appropriate <h2> subheadings.
             - Group related ideas under the current <h2> subheadings.
-            - Follow the output format EXACTLY.
-
-            Input format:
-            URL: Text
+            - Remove any duplicate or repeated points while combining the summaries.
+            - Make sure the sources are ONLY listed in the h1 headers.
+            - Prefer concise and clear phrasing for bullet points.
+            - Follow this output format EXACTLY:
 
-            Output format:
+            Output Format:
                 <h1>
-                    {idx + 1}. {term}
+                    {i + 1}. {term}
                     <a href="URL">
                         [Source 1]
                     </a>
@@ -308,150 +514,151 @@ def generate_notes(user_notes_path, text_file_path, vtt_file_path):
                         <li>bullet N</li>
                     </ul>
 
-            Here is the data grouped by source: {chunk}
+            Here are the multiple partial notes to combine:
+            {combined_summary}
             """
 
-            chunk_summary_response = client.models.generate_content(
-                model="gemini-2.0-flash", contents=[initial_prompt]
+            def combine_partials(partials):
+                return ask("gemini-2.0-flash", [combine_prompt("\n".join(partials))])
+
+            # too many partial summaries for one request are merged in rounds first
+            summaries = reduce_hierarchically(
+                summaries, combine_partials, REDUCE_TOKEN_BUDGET,
+                lambda func, items: _map_concurrently(func, items, CHUNK_CONCURRENCY),
             )
-            
-            summaries.append(chunk_summary_response.text)
 
-        # print(summaries)
-        combined_summary = "\n".join(summaries)
+            combined_notes_response = ask(
+                "gemini-2.0-flash", [combine_prompt("\n".join(summaries)), timestamped_notes]
+            )
 
-        final_prompt = f"""
-        You are an academic smart study researcher.
+            print(f"Finished term: {i + 1}", file=sys.stderr)
+            if publish is not None:
+                publish("web_section", {"index": i, "heading": term, "html": combined_notes_response})
+            return combined_notes_response
+
+        # skips empty newlines which sometimes happens
+        headings = [(i, term) for i, term in enumerate(key_headings) if term]
+        # headings are researched concurrently but written in outline order
+        web_sections = _map_concurrently(research_heading, headings, HEADING_CONCURRENCY)
+        web_notes = "".join(section + "\n" for section in web_sections)
+        workspace.write('web_notes.txt', web_notes)
+        return web_notes
+
+    def find_images(key_subheadings):
+        # google image searches to get relevant images for all subheadings
+        image_urls = search_images(key_subheadings)
+        subheading_image_pairs = [
+            {"subheading": subheading, "image_url": image_url}
+            for subheading, image_url in zip(key_subheadings, image_urls)
+        ]
+        return subheading_image_pairs
+
+    def add_images(subheading_image_pairs, timestamped_notes):
+        image_prompt = f"""
+        You are a skilled web content enhancer specialized in educational and academic materials.
 
         TASK:
-        - Combine the following multiple summarized notes into one clean, organized, and complete final set of notes.
-        - Make sure to preserve all the original points in the notes.
-        - If there are any new points in the website summaries that are not already covered in the original notes, add them under the appropriate <h2> subheadings.
-        - Group related ideas under the current <h2> subheadings.
-        - Remove any duplicate or repeated points while combining the summaries.
-        - Make sure the sources are ONLY listed in the h1 headers.
-        - Prefer concise and clear phrasing for bullet points.
-        - Follow this output format EXACTLY:
+        - For each <h2> subheading and its corresponding image_url (already provided):
+            - Check if the image meaningfully matches the topic of the subheading.
+            - Only insert the image if it clearly and logically represents the subheading's concept.
+            - If the image is relevant, insert it immediately after the <h2> tag using an <img src="URL", width="675"> tag.
+            - If the image is not relevant, skip inserting anything for that subheading.
+        - Keep the rest of the HTML content exactly as it is — only insert images where appropriate.
+        - Insert at most ONE image per subheading.
+        - Preserve the original structure, formatting, and indentation of the HTML.
 
         Output Format:
-            <h1>
-                {i + 1}. {term}
-                <a href="URL">
-                    [Source 1]
-                </a>
-                <a href="URL">
-                    [Source 2]
-                </a>
-                <a href="URL">
-                    [Source N]
-                </a>
-            </h1>
             <h2>SUBJECT SUBHEADING 1</h2>
-                <ul>
-                    <li>bullet 1</li>
-                    <li>bullet 2</li>
-                    <li>bullet N</li>
-                </ul>
+            <img src="URL", width="675">
+            <ul>
+                <li>bullet 1</li>
+                <li>bullet 2</li>
+                <li>bullet N</li>
+            </ul>
+            
             <h2>SUBJECT SUBHEADING 2</h2>
-                <ul>
-                    <li>bullet 1</li>
-                    <li>bullet 2</li>
-                    <li>bullet N</li>
-                </ul>
+            <img src="URL", width="675">
+            <ul>
+                <li>bullet 1</li>
+                <li>bullet 2</li>
+                <li>bullet N</li>
+            </ul>
+            
             <h2>SUBJECT SUBHEADING N</h2>
-                <ul>
-                    <li>bullet 1</li>
-                    <li>bullet 2</li>
-                    <li>bullet N</li>
-                </ul>
-
-        Here are the multiple partial notes to combine:
-        {combined_summary}
+            <img src="URL", width="675">
+            <ul>
+                <li>bullet 1</li>
+                <li>bullet 2</li>
+                <li>bullet N</li>
+            </ul>
+
+        Here are the subheadings and associated image URLs:
+        {subheading_image_pairs}
         """
-        # print(final_prompt)
-        
-        combined_notes_response = client.models.generate_content(
-            model="gemini-2.0-flash", contents=[final_prompt, timestamped_notes]
-        )
 
-        print(f"Finished term: {i + 1}", file=sys.stderr)
-        # if its the first term written overwrite the file, else append to the file
-        if i == 0:    
-            with open(f'./text_files/web_notes.txt', 'w') as output:
-                output.write(combined_notes_response.text)   
-                output.write("\n")
-        else:       
-            with open(f'./text_files/web_notes.txt', 'a') as output:
-                output.write(combined_notes_response.text)   
-                output.write("\n")
-    
-    # google image searches to get relevant images for all subheadings
-    subheading_image_pairs = []
-
-    for i, subheading in enumerate(key_subheadings):
-        image_url = google_image_search(subheading)
-        subheading_image_pairs.append({
-            "subheading": subheading,
-            "image_url": image_url
-        })
-        
-    image_prompt = f"""
-    You are a skilled web content enhancer specialized in educational and academic materials.
-
-    TASK:
-    - For each <h2> subheading and its corresponding image_url (already provided):
-        - Check if the image meaningfully matches the topic of the subheading.
-        - Only insert the image if it clearly and logically represents the subheading's concept.
-        - If the image is relevant, insert it immediately after the <h2> tag using an <img src="URL", width="675"> tag.
-        - If the image is not relevant, skip inserting anything for that subheading.
-    - Keep the rest of the HTML content exactly as it is — only insert images where appropriate.
-    - Insert at most ONE image per subheading.
-    - Preserve the original structure, formatting, and indentation of the HTML.
-
-    Output Format:
-        <h2>SUBJECT SUBHEADING 1</h2>
-        <img src="URL", width="675">
-        <ul>
-            <li>bullet 1</li>
-            <li>bullet 2</li>
-            <li>bullet N</li>
-        </ul>
-        
-        <h2>SUBJECT SUBHEADING 2</h2>
-        <img src="URL", width="675">
-        <ul>
-            <li>bullet 1</li>
-            <li>bullet 2</li>
-            <li>bullet N</li>
-        </ul>
-        
-        <h2>SUBJECT SUBHEADING N</h2>
-        <img src="URL", width="675">
-        <ul>
-            <li>bullet 1</li>
-            <li>bullet 2</li>
-            <li>bullet N</li>
-        </ul>
-
-    Here are the subheadings and associated image URLs:
-    {subheading_image_pairs}
-    """
-
-    image_response = combined_notes_response = client.models.generate_content(
-            model="gemini-2.0-flash", contents=[image_prompt, timestamped_notes]
-        )
-
-    print("Finished fetching images!", file=sys.stderr)
-    final_notes_with_images = image_response.text
+        image_response = combined_notes_response = ask(
+                "gemini-2.0-flash", [image_prompt, timestamped_notes]
+            )
 
-    #remove the boilerplate html tag from file
-    remove_first_and_last_lines(final_notes_with_images)
-    # save the final result as html file    
-    with open(f'./text_files/final_notes_with_images.html', 'w') as output:
-        output.write(final_notes_with_images)
-    
-    print("Successfully completed notes!", file=sys.stderr)
-    return final_notes_with_images
+        print("Finished fetching images!", file=sys.stderr)
+        final_notes_with_images = image_response
+
+        #remove the boilerplate html tag from file
+        remove_first_and_last_lines(final_notes_with_images)
+        # save the final result as html file    
+        workspace.write('final_notes_with_images.html', final_notes_with_images)
+        return final_notes_with_images
+
+    pipeline = Pipeline([
+        Stage("upload_transcript", upload_transcript, ["text_file_path"], ["raw_transcript"]),
+        Stage("upload_vtt", upload_vtt, ["vtt_file_path"], ["timestamped_transcript"]),
+        Stage("upload_user_notes", upload_user_notes, ["user_notes_path"], ["user_notes"]),
+        Stage("slide_text", extract_slide_text, ["slides_path"]),
+        Stage("initial_outline", outline, ["raw_transcript", "slide_text"]),
+        Stage("timestamped_outline", timestamp_outline, ["initial_outline", "vtt_file_path"]),
+        Stage("user_notes_outline", organize_user_notes, ["timestamped_outline", "user_notes"], ["templated_user_notes"]),
+        Stage("attach_user_notes_outline", attach_user_notes_outline, ["templated_user_notes"], ["formatted_user_notes"]),
+        Stage("timestamped_notes", expand_notes, ["formatted_user_notes", "timestamped_transcript"], ["timestamped_notes_text"]),
+        Stage("attach_timestamped_notes", attach_timestamped_notes, ["timestamped_notes_text"], ["timestamped_notes"]),
+        Stage("key_headings", extract_key_headings, ["timestamped_notes"]),
+        Stage("key_subheadings", extract_key_subheadings, ["timestamped_notes"]),
+        Stage("web_research", research_headings, ["key_headings", "timestamped_notes"], ["web_notes"]),
+        Stage("images", find_images, ["key_subheadings"], ["subheading_image_pairs"]),
+        Stage("final_notes", add_images, ["subheading_image_pairs", "timestamped_notes"]),
+    ], max_workers=STAGE_CONCURRENCY)
+
+    # stage outputs from the previous run stay valid unless they depend on a changed input
+    reuse = {}
+    if previous:
+        stale = pipeline.downstream(changed or ())
+        reuse = {name: value for name, value in previous.items() if name in REUSABLE_VALUES and name not in stale}
+
+    def on_output(name, value):
+        if publish is not None and name in STREAMED_VALUES:
+            publish(name, value)
+
+    # reused outputs are available straight away
+    for name, value in reuse.items():
+        on_output(name, value)
+
+    started = time.perf_counter()
+    values, timings = pipeline.run({
+        "user_notes_path": user_notes_path,
+        "text_file_path": text_file_path,
+        "vtt_file_path": vtt_file_path,
+        "slides_path": slides_path,
+        **reuse,
+    }, report=report, on_output=on_output)
+
+    print(f"Successfully completed notes in {time.perf_counter() - started:.2f}s, reused {len(reuse)} stage outputs", file=sys.stderr)
+    if timings:
+        slowest = max(timings, key=timings.get)
+        print(f"Slowest stage: {slowest}, {timings[slowest]:.2f}s", file=sys.stderr)
+    return values["final_notes"], {name: values[name] for name in REUSABLE_VALUES}
+
+def generate_notes(user_notes_path, text_file_path, vtt_file_path, report=None, use_cache=True, slides_path=""):
+    final_notes, _ = run_note_pipeline(user_notes_path, text_file_path, vtt_file_path, report=report, use_cache=use_cache, slides_path=slides_path)
+    return final_notes
 
 # if __name__ == '__main__':
 #     generate_notes('./text_files/user_notes.html', './text_files/transcript.txt', './text_files/transcript.vtt')
\ No newline at end of file
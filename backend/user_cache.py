@@ -0,0 +1,48 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class UserCache:
+    """
+    Recently authenticated users keyed by token subject, each kept for ttl
+    seconds. Entries are dropped by invalidate() when a user changes; the
+    TTL bounds how long a change made elsewhere goes unnoticed.
+    """
+
+    def __init__(self, max_entries=1024, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, subject):
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                self._entries.pop(subject, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(subject)
+            self.hits += 1
+            # a copy, so a route that edits its user cannot change the cached one
+            return dict(entry[1])
+
+    def put(self, subject, user):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[subject] = (time.monotonic(), dict(user))
+            self._entries.move_to_end(subject)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, subject):
+        with self._lock:
+            self._entries.pop(subject, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,200 @@
+import hashlib
+import io
+import json
+import re
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+
+TIMING_RE = re.compile(r"((?:\d+:)?\d{1,2}:\d{2}\.\d{3})\s+-->\s+((?:\d+:)?\d{1,2}:\d{2}\.\d{3})")
+VOICE_RE = re.compile(r"<v(?:\.[^\s>]*)?\s+([^>]*)>")
+TAG_RE = re.compile(r"</?[^>]*>")
+
+
+def parse_timestamp(value):
+    """Seconds for a WebVTT timestamp, either hh:mm:ss.ttt or mm:ss.ttt."""
+    seconds = 0.0
+    for part in value.split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def format_timestamp(seconds):
+    """[hh:mm:ss] label used for timestamps in the notes."""
+    seconds = int(seconds)
+    return f"[{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}]"
+
+
+def vtt_digest(text):
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def _blocks(lines):
+    block = []
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line.strip():
+            block.append(line)
+        elif block:
+            yield block
+            block = []
+    if block:
+        yield block
+
+
+def iter_cues(lines):
+    """
+    Parse WebVTT one block at a time from any iterable of lines. Yields
+    (start, end, speaker, text, confidences) per cue; a NOTE CONF {"raw": [...]}
+    block carries the word confidences of the cue before it.
+    """
+    cue = None
+    for block in _blocks(lines):
+        if block[0].startswith("NOTE"):
+            if cue is not None and block[0].startswith("NOTE CONF"):
+                try:
+                    cue[4] = [int(value) for value in json.loads(block[0][len("NOTE CONF"):])["raw"]]
+                except (ValueError, KeyError, TypeError):
+                    pass
+            continue
+
+        # the timing line is either first or follows an optional cue identifier
+        for position, line in enumerate(block[:2]):
+            timing = TIMING_RE.search(line)
+            if timing:
+                break
+        else:
+            continue  # WEBVTT header, STYLE or REGION block
+
+        if cue is not None:
+            yield tuple(cue)
+
+        payload = " ".join(block[position + 1:])
+        voice = VOICE_RE.search(payload)
+        text = " ".join(TAG_RE.sub("", payload).split())
+        cue = [
+            parse_timestamp(timing.group(1)),
+            parse_timestamp(timing.group(2)),
+            voice.group(1).strip() if voice else "",
+            text,
+            [],
+        ]
+
+    if cue is not None:
+        yield tuple(cue)
+
+
+class CueIndex:
+    """
+    Compact index over a transcript's cues. Times, speakers and confidences sit
+    in typed arrays and the cue texts in one string addressed by offsets, so
+    time lookups are a bisect rather than a scan of the document.
+    """
+
+    def __init__(self):
+        self.starts = array("d")
+        self.ends = array("d")
+        self.speaker_ids = array("H")
+        self.speakers = []
+        self.text_offsets = array("L", [0])
+        self.confidences = array("B")
+        self.confidence_offsets = array("L", [0])
+        self.text = ""
+        # end of the last cue to finish, worked out once while loading
+        self.duration = 0.0
+
+    @classmethod
+    def from_lines(cls, lines):
+        index = cls()
+        speaker_ids = {}
+        texts = []
+        length = 0
+        for start, end, speaker, text, confidences in iter_cues(lines):
+            if speaker not in speaker_ids:
+                speaker_ids[speaker] = len(index.speakers)
+                index.speakers.append(speaker)
+            index.starts.append(start)
+            index.ends.append(end)
+            index.speaker_ids.append(speaker_ids[speaker])
+            texts.append(text)
+            length += len(text)
+            index.text_offsets.append(length)
+            index.confidences.extend(min(max(value, 0), 255) for value in confidences)
+            index.confidence_offsets.append(len(index.confidences))
+        index.text = "".join(texts)
+        index.duration = max(index.ends) if index.ends else 0.0
+        return index
+
+    @classmethod
+    def from_text(cls, text):
+        return cls.from_lines(io.StringIO(text or ""))
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls.from_lines(f)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def cue(self, i):
+        return {
+            "index": i,
+            "start": self.starts[i],
+            "end": self.ends[i],
+            "speaker": self.speakers[self.speaker_ids[i]],
+            "text": self.text[self.text_offsets[i]:self.text_offsets[i + 1]],
+            "confidence": self.confidences[self.confidence_offsets[i]:self.confidence_offsets[i + 1]].tolist(),
+        }
+
+    def find(self, t):
+        """Index of the cue being spoken at t, or of the last cue before t if t falls in a gap; -1 before the first cue."""
+        return bisect_right(self.starts, t) - 1
+
+    def at(self, t):
+        """The cue covering time t, or None when nothing is spoken then."""
+        i = self.find(t)
+        if i < 0 or self.ends[i] < t:
+            return None
+        return self.cue(i)
+
+    def span(self, t1, t2):
+        """(first, stop) cue indexes overlapping [t1, t2]."""
+        first = bisect_left(self.starts, t1)
+        # cues that started earlier but are still running at t1
+        while first > 0 and self.ends[first - 1] > t1:
+            first -= 1
+        return first, max(first, bisect_right(self.starts, t2))
+
+    def between(self, t1, t2):
+        first, stop = self.span(t1, t2)
+        return [self.cue(i) for i in range(first, stop)]
+
+    def text_between(self, t1, t2):
+        first, stop = self.span(t1, t2)
+        return " ".join(self.text[self.text_offsets[i]:self.text_offsets[i + 1]] for i in range(first, stop))
+
+
+class CueIndexCache:
+    """Keeps the most recently used transcript indexes, keyed by lecture and transcript digest."""
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, digest):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != digest:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, digest, index):
+        with self._lock:
+            self._entries[key] = (digest, index)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -0,0 +1,79 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from llm_cache import CACHE_DIR
+
+DEFAULT_WEB_CACHE_PATH = os.path.join(CACHE_DIR, "web.sqlite3")
+
+
+class WebCache:
+    """
+    Persistent TTL cache for search queries (query -> result URLs) and scraped
+    pages (URL -> extracted text plus the validators needed to revalidate it).
+    """
+
+    def __init__(self, path=DEFAULT_WEB_CACHE_PATH, search_ttl=7 * 24 * 3600, page_ttl=24 * 3600):
+        self.search_ttl = search_ttl
+        self.page_ttl = page_ttl
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS searches ("
+            " query TEXT NOT NULL, num INTEGER NOT NULL, urls TEXT NOT NULL, fetched_at REAL NOT NULL,"
+            " PRIMARY KEY (query, num))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " url TEXT PRIMARY KEY, text TEXT NOT NULL, etag TEXT, last_modified TEXT, fetched_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get_search(self, query, num):
+        """Return the cached URL list if it is still within its TTL, else None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT urls, fetched_at FROM searches WHERE query = ? AND num = ?", (query, num)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.search_ttl:
+            return None
+        return json.loads(row[0])
+
+    def put_search(self, query, num, urls):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO searches (query, num, urls, fetched_at) VALUES (?, ?, ?, ?)",
+                (query, num, json.dumps(urls), time.time()),
+            )
+            self._conn.commit()
+
+    def get_page(self, url):
+        """
+        Return (entry, fresh) where entry is a dict with text, etag and
+        last_modified or None. A stale entry can still be revalidated.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text, etag, last_modified, fetched_at FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None, False
+        entry = {"text": row[0], "etag": row[1], "last_modified": row[2]}
+        return entry, time.time() - row[3] <= self.page_ttl
+
+    def put_page(self, url, text, etag=None, last_modified=None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, text, etag, last_modified, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (url, text, etag, last_modified, time.time()),
+            )
+            self._conn.commit()
+
+    def touch_page(self, url):
+        """Mark a page fresh again after the origin answered 304 Not Modified."""
+        with self._lock:
+            self._conn.execute("UPDATE pages SET fetched_at = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
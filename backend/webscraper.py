@@ -1,16 +1,40 @@
 import requests
+import httpx
+import asyncio
 from dotenv import load_dotenv
 from googlesearch import search
-from bs4 import BeautifulSoup
-from pdfminer.high_level import extract_text
-from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
 import random
 import time
 import sys
 import os
+from web_cache import WebCache, DEFAULT_WEB_CACHE_PATH
+from extraction import extract, html_text, pdf_text
+from http_client import ASYNC_LIMITS, ASYNC_TIMEOUT, call_with_backoff, host_limiter, request_async, get as http_get
 
 load_dotenv()
 
+# how many result pages are downloaded at once for a single query
+SCRAPE_CONCURRENCY = int(os.getenv('SCRAPE_CONCURRENCY', '3'))
+
+# a result page is given this long to connect and between bytes, and this long in total
+SCRAPE_TIMEOUT = float(os.getenv('SCRAPE_TIMEOUT', '10'))
+SCRAPE_DEADLINE = float(os.getenv('SCRAPE_DEADLINE', '30'))
+# larger bodies are cut off; an HTML page keeps what arrived, a cut-off PDF cannot be parsed and is skipped
+SCRAPE_MAX_BYTES = int(os.getenv('SCRAPE_MAX_MB', '10')) * 1024 * 1024
+# only the start of a long PDF is read; a heading's background is rarely on page 300
+SCRAPE_MAX_PDF_PAGES = int(os.getenv('SCRAPE_MAX_PDF_PAGES', '40'))
+# parsing one document in the extraction pool is abandoned after this many seconds
+SCRAPE_EXTRACT_TIMEOUT = float(os.getenv('SCRAPE_EXTRACT_TIMEOUT', '20'))
+SCRAPE_CHUNK_BYTES = 64 * 1024
+
+# popular headings repeat across lectures, so search results and page text are kept between runs
+web_cache = WebCache(
+    os.getenv('WEB_CACHE_PATH', DEFAULT_WEB_CACHE_PATH),
+    search_ttl=int(os.getenv('SEARCH_CACHE_TTL', str(7 * 24 * 3600))),
+    page_ttl=int(os.getenv('PAGE_CACHE_TTL', str(24 * 3600))),
+)
+
 def is_likely_diagram(image_url, metadata=None):
     """Check if the image URL or metadata suggests it's an educational diagram."""
     diagram_keywords = ["diagram", "flowchart", "chart", "concept", "explanation", "graph", "visual", "equations"]
@@ -27,71 +51,154 @@ def is_likely_diagram(image_url, metadata=None):
 
     return False
 
-def is_image_valid(image_url):
-    """Check if the image URL is valid by making a request and ensuring the status code is 200."""
+IMAGE_SEARCH_URL = "https://www.googleapis.com/customsearch/v1"
+
+async def _check_image(client, image_url):
+    """Check the URL serves an image without downloading it: HEAD first, then a 1 KB ranged GET
+    for servers that reject HEAD or omit the content type."""
     try:
-        response = requests.get(image_url)
-        # Check if the image returns a valid status code
-        if response.status_code == 200:
-            # Check if it's an image by verifying its content type
-            content_type = response.headers.get('Content-Type', '')
-            if 'image' in content_type:
-                return True
-    except requests.exceptions.RequestException:
-        pass
-    return False
+        response = await request_async(client, "HEAD", image_url, retries=1)
+        if response.status_code == 200 and 'image' in response.headers.get('Content-Type', ''):
+            return True
+        if response.status_code in (404, 410):
+            return False
+
+        async with host_limiter(image_url).async_slot():
+            async with client.stream("GET", image_url, headers={"Range": "bytes=0-1023"}) as response:
+                return response.status_code in (200, 206) and 'image' in response.headers.get('Content-Type', '')
+    except httpx.HTTPError:
+        return False
+
+def is_image_valid(client, image_url, memo):
+    """Check if the image URL is valid, sharing one check per URL across the run via memo."""
+    if image_url not in memo:
+        memo[image_url] = asyncio.ensure_future(_check_image(client, image_url))
+    return memo[image_url]
 
-def google_image_search(query):
+async def google_image_search(client, query, memo):
     # perform a smarter image search, filtering for educational diagrams/equations.
-    api_key = os.getenv('GEMINI_API_KEY')
-    cx = os.getenv('SEARCH_ENGINE_ID')
-     
-    search_url = f"https://www.googleapis.com/customsearch/v1?q={query}&searchType=image&key={api_key}&cx={cx}&num=3"
-    
-    response = requests.get(search_url)
+    params = {
+        "q": query,
+        "searchType": "image",
+        "key": os.getenv('GEMINI_API_KEY'),
+        "cx": os.getenv('SEARCH_ENGINE_ID'),
+        "num": 3,
+    }
+
+    try:
+        response = await request_async(client, "GET", IMAGE_SEARCH_URL, params=params)
+    except httpx.HTTPError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return None
     if response.status_code != 200:
-        print(f"Error: {response.status_code}")
+        print(f"Error: {response.status_code}", file=sys.stderr)
         return None
     
     results = response.json()
-    items = results.get('items', [])
+    items = [item for item in results.get('items', []) if item.get('link')]
 
-    for item in items:
-        image_url = item.get('link')
+    # validate every candidate at once; the checks are memoized per URL
+    valid = await asyncio.gather(*(is_image_valid(client, item['link'], memo) for item in items))
+
+    for item, ok in zip(items, valid):
+        image_url = item['link']
         metadata = {
             "title": item.get('title', ''),
             "snippet": item.get('snippet', '')
         }
         # return the first good match
-        if is_image_valid(image_url) and is_likely_diagram(image_url, metadata):
+        if ok and is_likely_diagram(image_url, metadata):
             return image_url  
 
     # fallback: return the first image if no perfect match
-    for item in items:
-        image_url = item.get('link')
-        if is_image_valid(image_url):
-            return image_url
+    for item, ok in zip(items, valid):
+        if ok:
+            return item['link']
     
     return None
 
+async def _search_images(queries):
+    memo = {}
+    async with httpx.AsyncClient(limits=ASYNC_LIMITS, timeout=ASYNC_TIMEOUT, follow_redirects=True) as client:
+        return await asyncio.gather(*(google_image_search(client, query, memo) for query in queries))
+
+def search_images(queries):
+    """Resolve an image URL (or None) for every query concurrently; results keep the query order."""
+    return asyncio.run(_search_images(queries))
+
 def scrape_website(url):
-    response = requests.get(url)
-    html = response.text
-    content_type = response.headers.get('content-type')
-    all_text = ""
-    
-    if content_type == "application/pdf":
-        try:
-            all_text = extract_text(BytesIO(response.content))
-        except Exception as e:
-            print(f"[Skipping PDF] Error extracting text from PDF at {url}: {e}", file=sys.stderr)
+    cached, fresh = web_cache.get_page(url)
+    if cached and fresh:
+        return cached['text']
+
+    # a stale entry is revalidated with its validators instead of refetched outright
+    headers = {}
+    if cached and cached['etag']:
+        headers['If-None-Match'] = cached['etag']
+    if cached and cached['last_modified']:
+        headers['If-Modified-Since'] = cached['last_modified']
+
+    try:
+        response = http_get(url, headers=headers, stream=True, timeout=SCRAPE_TIMEOUT)
+    except requests.RequestException as e:
+        print(f"[Skipping] Could not fetch {url}: {e}", file=sys.stderr)
+        return cached['text'] if cached else ""
+
+    with response:
+        if cached and response.status_code == 304:
+            web_cache.touch_page(url)
+            return cached['text']
+
+        content_type = (response.headers.get('content-type') or "").split(';')[0].strip().lower()
+        is_pdf = content_type == "application/pdf"
+        if not is_pdf and content_type and not content_type.startswith("text/") and "html" not in content_type:
+            print(f"[Skipping] Unsupported content type {content_type} at {url}", file=sys.stderr)
             return ""
-    else:
-        soup = BeautifulSoup(html, "html.parser")
-        all_text = soup.get_text(separator=' ', strip=True)
 
+        body, complete = read_capped(response)
+        encoding = response.encoding
+
+    if is_pdf and not complete:
+        print(f"[Skipping PDF] {url} is larger than {SCRAPE_MAX_BYTES} bytes or too slow to download", file=sys.stderr)
+        return ""
+
+    # parsing runs in the extraction pool, so a huge or malformed document costs at most its timeout
+    try:
+        if is_pdf:
+            all_text = extract(pdf_text, body, SCRAPE_MAX_PDF_PAGES, timeout=SCRAPE_EXTRACT_TIMEOUT)
+        else:
+            all_text = extract(html_text, body, encoding, timeout=SCRAPE_EXTRACT_TIMEOUT)
+    except Exception as e:
+        print(f"[Skipping] Error extracting text from {url}: {e!r}", file=sys.stderr)
+        return ""
+
+    if response.status_code == 200:
+        web_cache.put_page(url, all_text, response.headers.get('ETag'), response.headers.get('Last-Modified'))
     return all_text
 
+def read_capped(response):
+    """
+    Read a streamed response body up to SCRAPE_MAX_BYTES and SCRAPE_DEADLINE.
+    Returns (body, complete); complete is False when the body was cut off.
+    """
+    declared = response.headers.get('Content-Length')
+    if declared and declared.isdigit() and int(declared) > SCRAPE_MAX_BYTES:
+        return b"", False
+
+    started = time.monotonic()
+    chunks = []
+    size = 0
+    try:
+        for chunk in response.iter_content(SCRAPE_CHUNK_BYTES):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size > SCRAPE_MAX_BYTES or time.monotonic() - started > SCRAPE_DEADLINE:
+                return b"".join(chunks)[:SCRAPE_MAX_BYTES], False
+    except requests.RequestException as e:
+        print(f"Download interrupted: {e}", file=sys.stderr)
+        return b"".join(chunks), False
+    return b"".join(chunks), True
+
 def is_academic_url(url):
     academic_domains = [
         '.edu', '.gov', '.org', 
@@ -100,27 +207,39 @@ def is_academic_url(url):
     ]
     return any(domain in url for domain in academic_domains)
 
-# retry 3 times in case google blocks request
+# searches share one rate limit across threads and back off when google blocks a request
 def safe_search(query, num_sites):
+    cache_key = query.strip().lower()
+    cached = web_cache.get_search(cache_key, num_sites)
+    if cached is not None:
+        return cached
+
     retries = 3
-    for attempt in range(retries):
-        try:
-            all_results = list(search(query, num=20, start=0, stop=20, pause=random.uniform(2, 4)))
-            academic_results = [url for url in all_results if is_academic_url(url)]
-            return academic_results[:num_sites]
-        except Exception as e:
-            print(f"[Attempt {attempt+1}/{retries}] Search failed: {e}", file=sys.stderr)
-            wait_time = random.uniform(2, 5)
-            print(f"Retrying after {wait_time:.2f} seconds...", file=sys.stderr)
-            time.sleep(wait_time)
-    raise Exception("Failed search after 3 retries.")
+    try:
+        all_results = call_with_backoff(
+            "google-search",
+            lambda: list(search(query, num=20, start=0, stop=20, pause=random.uniform(2, 4))),
+            lambda e: True,
+            retries=retries,
+        )
+    except Exception as e:
+        print(f"Search failed: {e}", file=sys.stderr)
+        raise Exception(f"Failed search after {retries} retries.")
+    academic_results = [url for url in all_results if is_academic_url(url)][:num_sites]
+    web_cache.put_search(cache_key, num_sites, academic_results)
+    return academic_results
 
 def search_web(query, num_sites=0):
     data = []   
     res = safe_search(query, num_sites)
+    if not res:
+        return data
+
+    # scrape the results concurrently; map() keeps them in search-rank order
+    with ThreadPoolExecutor(max_workers=min(SCRAPE_CONCURRENCY, len(res))) as pool:
+        texts = list(pool.map(scrape_website, res))
 
-    for url in res:
-        text = scrape_website(url)
+    for url, text in zip(res, texts):
         if text.strip():
             data.append({ 'url' : url, 'text' : text })
 
@@ -0,0 +1,39 @@
+import os
+import threading
+import uuid
+
+
+class Workspace:
+    """
+    Holds one pipeline run's intermediate files. Contents live in memory; when
+    spill_dir is set they are also written to spill_dir/<run id>/ for inspection.
+    Every run gets its own workspace, so concurrent runs never share files.
+    """
+
+    def __init__(self, spill_dir=None):
+        self.id = uuid.uuid4().hex
+        self.path = os.path.join(spill_dir, self.id) if spill_dir else None
+        self._files = {}
+        self._lock = threading.Lock()
+        if self.path:
+            os.makedirs(self.path, exist_ok=True)
+
+    def write(self, name, text):
+        data = text.encode("utf-8")
+        with self._lock:
+            self._files[name] = data
+        if self.path:
+            with open(os.path.join(self.path, name), "wb") as f:
+                f.write(data)
+        return data
+
+    def read_bytes(self, name):
+        with self._lock:
+            return self._files[name]
+
+    def read(self, name):
+        return self.read_bytes(name).decode("utf-8")
+
+    def names(self):
+        with self._lock:
+            return list(self._files)
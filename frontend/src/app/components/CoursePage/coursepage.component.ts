@@ -9,7 +9,9 @@ import { CourseService, Course, CreateCourseResponse } from '../../services/cour
 })
 export class CoursePageComponent implements OnInit {
   courses: Course[] = [];
+  nextCursor: string | null = null;
   isLoading = true;
+  isLoadingMore = false;
   isCreatingCourse = false;
 
   constructor(
@@ -23,9 +25,10 @@ export class CoursePageComponent implements OnInit {
 
   loadCourses(): void {
     this.isLoading = true;
-    this.courseService.getAllCourses().subscribe({
+    this.courseService.getCourses().subscribe({
       next: (response) => {
         this.courses = response.courses;
+        this.nextCursor = response.next_cursor || null;
         this.isLoading = false;
       },
       error: (error) => {
@@ -35,6 +38,24 @@ export class CoursePageComponent implements OnInit {
     });
   }
 
+  loadMoreCourses(): void {
+    if (!this.nextCursor || this.isLoadingMore) {
+      return;
+    }
+    this.isLoadingMore = true;
+    this.courseService.getCourses(this.nextCursor).subscribe({
+      next: (response) => {
+        this.courses = [...this.courses, ...response.courses];
+        this.nextCursor = response.next_cursor || null;
+        this.isLoadingMore = false;
+      },
+      error: (error) => {
+        console.error('Error fetching more courses:', error);
+        this.isLoadingMore = false;
+      }
+    });
+  }
+
   openCourse(courseId: string, courseName: string): void {
     console.log('Opening course:', courseName, 'ID:', courseId);
     // Navigate to the lectures page with the courseId
@@ -1,7 +1,7 @@
 import { Component, OnInit } from '@angular/core';
 import { ActivatedRoute, Router } from '@angular/router';
-import { HttpClient } from '@angular/common/http';
 import { AuthService } from '../../services/auth.service';
+import { CourseService } from '../../services/course.service';
 
 @Component({
   selector: 'app-left-navbar',
@@ -15,9 +15,9 @@ export class LeftNavbarComponent implements OnInit {
 
   constructor(
     private route: ActivatedRoute,
-    private http: HttpClient,
     private router: Router, // Added Router for navigation
-    private authService: AuthService // Added AuthService for logout
+    private authService: AuthService, // Added AuthService for logout
+    private courseService: CourseService
   ) {}
 
   ngOnInit(): void {
@@ -28,11 +28,10 @@ export class LeftNavbarComponent implements OnInit {
   }
 
   private fetchCourseName(courseId: string): void {
-    const url = 'http://localhost:8000/courses';
-    this.http.get<{ courses: { course_name: string; course_id: string }[] }>(url).subscribe({
+    // A one-lecture page is enough to get the course name
+    this.courseService.getLectures(courseId, null, 1).subscribe({
       next: (response) => {
-        const course = response.courses.find((c) => c.course_id === courseId);
-        this.currentCourseName = course ? course.course_name : 'Unknown Course';
+        this.currentCourseName = response.course_name || 'Unknown Course';
       },
       error: (error) => {
         console.error('Error fetching course name:', error);
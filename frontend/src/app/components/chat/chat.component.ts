@@ -7,6 +7,8 @@ import { firstValueFrom } from 'rxjs';
 import { LectureDataService, LectureUpdateResponse } from '../../services/lecture-data.service';
 import { PdfStateService } from 'src/app/services/pdf-state.service';
 import { NoteService } from '../../services/note.service';
+import { StartedJobResponse } from '../../services/job.service';
+import { AudioRecordingService } from '../../services/audio-recording.service';
 
 
 interface TranscriptEntry {
@@ -57,7 +59,8 @@ export class ChatComponent implements OnInit, OnDestroy, AfterViewChecked {
     private lectureDataService: LectureDataService,
     private router: Router,
     private pdfStateService: PdfStateService, // Add this,
-    private noteService: NoteService
+    private noteService: NoteService,
+    private audioRecordingService: AudioRecordingService
   ) {}
 
   ngOnInit(): void {
@@ -222,9 +225,10 @@ export class ChatComponent implements OnInit, OnDestroy, AfterViewChecked {
         // Set the initial local filename (will be updated with server path after request)
         lectureData.recording = fileName;
 
-        // send a POST request to the server to save the audio file
+        // Upload the recording in resumable chunks, then attach it to the lecture by name
+        const uploaded = await this.audioRecordingService.uploadRecording(audioData.blob, fileName);
         const formData = new FormData();
-        formData.append('audio', audioData.blob, fileName);
+        formData.append('recording', uploaded.filename);
         formData.append('courseId', this.courseId || '');
         formData.append('lectureId', this.lectureId || '');
         // Add title and transcript which are required by the backend
@@ -279,9 +283,15 @@ export class ChatComponent implements OnInit, OnDestroy, AfterViewChecked {
       this.isStoppedState = false;
       this.hasLogs = true;
       
-      // Send POST request to the endpoint
+      // Send POST request to the endpoint; AI notes are generated in a background job
+      // that the saved-note page streams, so there is no need to wait for it here
+      const startedJob = await firstValueFrom(
+        this.http.post<StartedJobResponse>(endpoint, lectureData)
+      );
+      console.log('Started note generation:', startedJob);
+
       const response = await firstValueFrom(
-        this.http.post<LectureUpdateResponse>(endpoint, lectureData)
+        this.http.get<LectureUpdateResponse>(endpoint)
       );
 
 
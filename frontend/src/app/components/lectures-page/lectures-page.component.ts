@@ -2,15 +2,7 @@ import { Component, OnInit } from '@angular/core';
 import { HttpClient } from '@angular/common/http';
 import { ActivatedRoute, Router } from '@angular/router';
 import { NoteService } from 'src/app/services/note.service';
-
-interface Lecture {
-  lecture_name: string;
-  lecture_id: string;
-}
-
-interface LecturesResponse {
-  lectures: Lecture[];
-}
+import { CourseService, Lecture } from 'src/app/services/course.service';
 
 @Component({
   selector: 'app-lectures-page',
@@ -21,14 +13,17 @@ export class LecturesPageComponent implements OnInit {
   courseId: string = '';
   courseName: string = '';
   lectures: Lecture[] = [];
+  nextCursor: string | null = null;
   isLoading: boolean = true;
+  isLoadingMore: boolean = false;
   error: string | null = null;
 
   constructor(
     private http: HttpClient,
     private route: ActivatedRoute,
     private router: Router,
-    private noteService: NoteService
+    private noteService: NoteService,
+    private courseService: CourseService
   ) { }
 
   ngOnInit(): void {
@@ -46,24 +41,14 @@ export class LecturesPageComponent implements OnInit {
 
   loadLectures(courseId: string): void {
     this.isLoading = true;
-    this.http.get<LecturesResponse>(`http://localhost:8000/courses/${courseId}`)
+    this.courseService.getLectures(courseId)
       .subscribe({
         next: (response) => {
           this.lectures = response.lectures;
+          this.nextCursor = response.next_cursor || null;
+          // The course name for the breadcrumb comes with the lectures
+          this.courseName = response.course_name || 'Unknown Course';
           this.isLoading = false;
-          
-          // Also fetch the course name for the breadcrumb
-          this.http.get<{ courses: { course_name: string; course_id: string }[] }>('http://localhost:8000/courses')
-            .subscribe({
-              next: (coursesResponse) => {
-                const course = coursesResponse.courses.find((c) => c.course_id === courseId);
-                this.courseName = course ? course.course_name : 'Unknown Course';
-              },
-              error: (error) => {
-                console.error('Error fetching course name:', error);
-                this.courseName = 'Unknown Course';
-              }
-            });
         },
         error: (error) => {
           console.error('Error loading lectures:', error);
@@ -73,6 +58,25 @@ export class LecturesPageComponent implements OnInit {
       });
   }
 
+  loadMoreLectures(): void {
+    if (!this.nextCursor || this.isLoadingMore) {
+      return;
+    }
+    this.isLoadingMore = true;
+    this.courseService.getLectures(this.courseId, this.nextCursor)
+      .subscribe({
+        next: (response) => {
+          this.lectures = [...this.lectures, ...response.lectures];
+          this.nextCursor = response.next_cursor || null;
+          this.isLoadingMore = false;
+        },
+        error: (error) => {
+          console.error('Error loading more lectures:', error);
+          this.isLoadingMore = false;
+        }
+      });
+  }
+
   viewLecture(lectureId: string, lectureName: string): void {
     console.log('View lecture:', lectureId, lectureName);
     if (lectureName) {
@@ -6,6 +6,10 @@ import { LectureDataService, LectureUpdateResponse } from '../../services/lectur
 import { Subscription } from 'rxjs';
 import { HttpClient } from '@angular/common/http';
 import { FileService } from '../../services/file.service';
+import { JobService } from '../../services/job.service';
+
+// Stage outputs shown in the AI notes tab while generation runs, least to most complete
+const AI_NOTE_PREVIEW_EVENTS = ['initial_outline', 'timestamped_outline', 'timestamped_notes_text', 'final_notes'];
 
 interface TranscriptLine {
   startTime: number;
@@ -50,6 +54,7 @@ export class SavedNoteComponent implements OnInit, OnDestroy {
   lectureData: LectureUpdateResponse | null = null;
   lectureTitle: string = 'Untitled Note';
   private lectureDataSubscription: Subscription | null = null;
+  private noteStreamSubscription: Subscription | null = null;
 
   // Tab navigation
   activeTab: 'notes' | 'ai-notes' = 'notes'; // Default to notes tab
@@ -63,7 +68,8 @@ export class SavedNoteComponent implements OnInit, OnDestroy {
     private route: ActivatedRoute,
     private lectureDataService: LectureDataService,
     private http: HttpClient,
-    private fileService: FileService
+    private fileService: FileService,
+    private jobService: JobService
   ) {}
 
   ngOnInit(): void {
@@ -110,12 +116,36 @@ export class SavedNoteComponent implements OnInit, OnDestroy {
         this.lectureData = response;
         this.processLectureData(response);
         console.log('Lecture data processed finally:', this.lectureData);
+
+        this.streamAiNotes(courseId, lectureId);
       },
       error: (error) => {
         console.error('Error fetching lecture data:', error);
       }
     });
   }
+
+  /**
+   * Follow AI note generation, showing each finished stage until the final notes arrive
+   * @param courseId The course ID
+   * @param lectureId The lecture ID
+   */
+  private streamAiNotes(courseId: string, lectureId: string): void {
+    if (this.noteStreamSubscription) {
+      this.noteStreamSubscription.unsubscribe();
+    }
+
+    this.noteStreamSubscription = this.jobService.streamLectureNotes(courseId, lectureId).subscribe({
+      next: ({ event, data }) => {
+        if (AI_NOTE_PREVIEW_EVENTS.includes(event) && typeof data === 'string' && data) {
+          this.lectureData = { ...(this.lectureData || {}), ai_note: data };
+        }
+      },
+      error: (error) => {
+        console.error('Error streaming AI notes:', error);
+      }
+    });
+  }
   
   /**
    * Process the lecture data received from the lecture data service
@@ -370,6 +400,10 @@ export class SavedNoteComponent implements OnInit, OnDestroy {
     if (this.lectureDataSubscription) {
       this.lectureDataSubscription.unsubscribe();
     }
+
+    if (this.noteStreamSubscription) {
+      this.noteStreamSubscription.unsubscribe();
+    }
   }
 
   // Add this method
@@ -1,6 +1,25 @@
 import { Injectable } from '@angular/core';
+import { HttpClient, HttpHeaders } from '@angular/common/http';
+import { firstValueFrom } from 'rxjs';
 import { TimerService } from './timer.service';
 
+interface UploadSession {
+  upload_id: string;
+  offset: number;
+  size: number;
+  chunk_size: number;
+}
+
+export interface UploadedRecording {
+  filename: string;
+  path: string;
+  url: string;
+  size: number;
+}
+
+// Consecutive failed chunks before an upload gives up
+const MAX_UPLOAD_RETRIES = 5;
+
 @Injectable({
   providedIn: 'root'
 })
@@ -10,8 +29,12 @@ export class AudioRecordingService {
   private audioChunks: Blob[] = [];
   private mediaRecorder: MediaRecorder | null = null;
   private audioURL: string | null = null;
+  private apiUrl = 'http://localhost:8000';
 
-  constructor(private timerService: TimerService) { }
+  constructor(
+    private timerService: TimerService,
+    private http: HttpClient
+  ) { }
 
   startRecording(): Promise<void> {
     this.isRecording = true;
@@ -93,6 +116,56 @@ export class AudioRecordingService {
     return this.isPaused;
   }
 
+  /**
+   * Upload a recording in chunks through the resumable upload API
+   * When a chunk fails, the server's offset is fetched and the upload continues from there
+   * @param blob The recording
+   * @param fileName Name used for the stored file's extension
+   * @returns The stored recording once every chunk has arrived
+   */
+  async uploadRecording(blob: Blob, fileName: string): Promise<UploadedRecording> {
+    const uploadsUrl = `${this.apiUrl}/api/uploads/audio`;
+    const session = await firstValueFrom(
+      this.http.post<UploadSession>(uploadsUrl, { filename: fileName, size: blob.size })
+    );
+    const sessionUrl = `${uploadsUrl}/${session.upload_id}`;
+    const headers = new HttpHeaders({ 'Content-Type': 'application/octet-stream' });
+
+    let offset = session.offset;
+    let failures = 0;
+    while (offset < blob.size) {
+      const chunk = blob.slice(offset, offset + session.chunk_size);
+      try {
+        const status = await firstValueFrom(
+          this.http.put<UploadSession>(sessionUrl, chunk, { headers, params: { offset } })
+        );
+        offset = status.offset;
+        failures = 0;
+      } catch (error) {
+        failures++;
+        if (failures > MAX_UPLOAD_RETRIES) {
+          throw error;
+        }
+        console.warn(`Recording upload interrupted at ${offset} bytes, retrying`, error);
+        await new Promise(resolve => setTimeout(resolve, 1000 * 2 ** (failures - 1)));
+        // Part of the chunk may have arrived; continue from what the server has
+        offset = await this.uploadedOffset(sessionUrl, offset);
+      }
+    }
+
+    return firstValueFrom(this.http.post<UploadedRecording>(`${sessionUrl}/complete`, {}));
+  }
+
+  private async uploadedOffset(sessionUrl: string, fallback: number): Promise<number> {
+    try {
+      const status = await firstValueFrom(this.http.get<UploadSession>(sessionUrl));
+      return status.offset;
+    } catch (error) {
+      console.warn('Could not fetch upload offset', error);
+      return fallback;
+    }
+  }
+
   cleanup(): void {
     if (this.audioURL) {
       URL.revokeObjectURL(this.audioURL);
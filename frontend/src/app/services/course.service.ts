@@ -1,5 +1,5 @@
 import { Injectable } from '@angular/core';
-import { HttpClient } from '@angular/common/http';
+import { HttpClient, HttpParams } from '@angular/common/http';
 import { Observable } from 'rxjs';
 import { AuthService } from './auth.service';
 
@@ -10,6 +10,18 @@ export interface Course {
 
 export interface CourseResponse {
   courses: Course[];
+  next_cursor?: string | null;
+}
+
+export interface Lecture {
+  lecture_name: string;
+  lecture_id: string;
+}
+
+export interface LectureResponse {
+  lectures: Lecture[];
+  course_name?: string | null;
+  next_cursor?: string | null;
 }
 
 export interface CreateCourseResponse {
@@ -28,12 +40,38 @@ export class CourseService {
     private authService: AuthService
   ) {}
 
-  getAllCourses(): Observable<CourseResponse> {
-    return this.http.get<CourseResponse>(`${this.apiUrl}/courses/`);
+  /**
+   * Get one page of courses
+   * @param cursor The next_cursor of the previous page, or null for the first page
+   * @param limit Page size; the server caps it
+   */
+  getCourses(cursor: string | null = null, limit?: number): Observable<CourseResponse> {
+    return this.http.get<CourseResponse>(`${this.apiUrl}/courses`, { params: this.pageParams(cursor, limit) });
     // The auth interceptor will handle adding the authorization header
   }
 
+  /**
+   * Get one page of a course's lectures, along with the course name
+   * @param courseId The course ID
+   * @param cursor The next_cursor of the previous page, or null for the first page
+   * @param limit Page size; the server caps it
+   */
+  getLectures(courseId: string, cursor: string | null = null, limit?: number): Observable<LectureResponse> {
+    return this.http.get<LectureResponse>(`${this.apiUrl}/courses/${courseId}`, { params: this.pageParams(cursor, limit) });
+  }
+
   addCourse(courseName: string): Observable<CreateCourseResponse> {
     return this.http.post<CreateCourseResponse>(`${this.apiUrl}/courses`, { course_name: courseName });
   }
+
+  private pageParams(cursor: string | null, limit?: number): HttpParams {
+    let params = new HttpParams();
+    if (cursor) {
+      params = params.set('cursor', cursor);
+    }
+    if (limit) {
+      params = params.set('limit', limit);
+    }
+    return params;
+  }
 }
\ No newline at end of file
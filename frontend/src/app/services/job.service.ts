@@ -0,0 +1,132 @@
+import { Injectable } from '@angular/core';
+import { HttpClient } from '@angular/common/http';
+import { Observable, timer } from 'rxjs';
+import { filter, switchMap, take } from 'rxjs/operators';
+import { AuthService } from './auth.service';
+
+export interface JobStage {
+  name: string;
+  status: string;
+  started_at?: string;
+  finished_at?: string;
+}
+
+export interface JobStatus {
+  job_id: string;
+  status: 'pending' | 'running' | 'succeeded' | 'failed' | 'cancelled';
+  stages: JobStage[];
+  error?: string;
+  course_id: string;
+  lecture_id: string;
+}
+
+export interface StartedJobResponse {
+  message: string;
+  job_id?: string;
+}
+
+export interface NoteStreamEvent {
+  event: string;
+  data: any;
+}
+
+const FINISHED_STATES = ['succeeded', 'failed', 'cancelled'];
+
+@Injectable({
+  providedIn: 'root'
+})
+export class JobService {
+  private apiUrl = 'http://localhost:8000';
+
+  constructor(
+    private http: HttpClient,
+    private authService: AuthService
+  ) {}
+
+  getJob(jobId: string): Observable<JobStatus> {
+    return this.http.get<JobStatus>(`${this.apiUrl}/jobs/${jobId}`);
+  }
+
+  cancelJob(jobId: string): Observable<JobStatus> {
+    return this.http.post<JobStatus>(`${this.apiUrl}/jobs/${jobId}/cancel`, {});
+  }
+
+  /**
+   * Poll a job until it reaches a finished state
+   * @param jobId The job to watch
+   * @param intervalMs Delay between polls
+   * @returns Observable emitting the final job status once
+   */
+  waitForJob(jobId: string, intervalMs = 2000): Observable<JobStatus> {
+    return timer(0, intervalMs).pipe(
+      switchMap(() => this.getJob(jobId)),
+      filter(job => FINISHED_STATES.includes(job.status)),
+      take(1)
+    );
+  }
+
+  /**
+   * Stream AI note generation for a lecture as server-sent events
+   * Uses fetch instead of EventSource so the auth header can be sent
+   * @param courseId The course ID
+   * @param lectureId The lecture ID
+   * @returns Observable of stage outputs, web sections and the final notes
+   */
+  streamLectureNotes(courseId: string, lectureId: string): Observable<NoteStreamEvent> {
+    return new Observable<NoteStreamEvent>(subscriber => {
+      const controller = new AbortController();
+      const token = this.authService.getToken();
+
+      fetch(`${this.apiUrl}/courses/${courseId}/${lectureId}/notes/stream`, {
+        headers: token ? { Authorization: `Bearer ${token}` } : {},
+        signal: controller.signal
+      }).then(async response => {
+        if (!response.ok || !response.body) {
+          throw new Error(`Note stream failed with status ${response.status}`);
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+          const { done, value } = await reader.read();
+          if (done) {
+            break;
+          }
+          buffer += decoder.decode(value, { stream: true });
+
+          // Events are separated by a blank line
+          let boundary = buffer.indexOf('\n\n');
+          while (boundary !== -1) {
+            const parsed = this.parseEvent(buffer.slice(0, boundary));
+            buffer = buffer.slice(boundary + 2);
+            if (parsed) {
+              subscriber.next(parsed);
+            }
+            boundary = buffer.indexOf('\n\n');
+          }
+        }
+        subscriber.complete();
+      }).catch(error => {
+        if (!controller.signal.aborted) {
+          subscriber.error(error);
+        }
+      });
+
+      return () => controller.abort();
+    });
+  }
+
+  private parseEvent(block: string): NoteStreamEvent | null {
+    let event = 'message';
+    const dataLines: string[] = [];
+    for (const line of block.split('\n')) {
+      if (line.startsWith('event:')) {
+        event = line.slice(6).trim();
+      } else if (line.startsWith('data:')) {
+        dataLines.push(line.slice(5).trimStart());
+      }
+    }
+    return dataLines.length ? { event, data: JSON.parse(dataLines.join('\n')) } : null;
+  }
+}